@@ -0,0 +1,50 @@
+import asyncio
+import time
+from telegram import InputMediaPhoto
+from config import ALBUM_COLLECT_SECONDS
+
+class MediaGroupBuffer:
+    """Collects the items of an album, which Telegram delivers as one update per photo.
+
+    The handler that sees the first item of a media group waits until no new item
+    has arrived for `window` seconds and then gets the whole album; handlers for
+    the other items just add theirs and return. This relies on the application
+    processing updates concurrently (concurrent_updates in main).
+    """
+
+    def __init__(self, window=ALBUM_COLLECT_SECONDS):
+        self.window = window
+        # media_group_id -> [messages, time the last item arrived]
+        self._groups = {}
+
+    async def collect(self, message):
+        """Add an album item; returns the album's messages in order to the first caller, None to the rest"""
+        group_id = message.media_group_id
+        group = self._groups.get(group_id)
+        if group is not None:
+            group[0].append(message)
+            group[1] = time.monotonic()
+            return None
+
+        group = self._groups[group_id] = [[message], time.monotonic()]
+        while True:
+            remaining = group[1] + self.window - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        del self._groups[group_id]
+        return sorted(group[0], key=lambda item: item.message_id)
+
+def album_media(payload):
+    """InputMediaPhoto list for an album payload; Telegram shows the first item's caption for the whole album"""
+    return [
+        InputMediaPhoto(
+            media=file_id,
+            caption=(payload["caption"] or None) if index == 0 else None,
+            parse_mode=payload.get("parse_mode", "HTML") if index == 0 else None
+        )
+        for index, file_id in enumerate(payload["media"])
+    ]
+
+# Shared by all message handlers
+media_groups = MediaGroupBuffer()
@@ -0,0 +1,186 @@
+"""End-to-end broadcast benchmark against the fake Bot API server, no bot token or channels needed.
+
+The admin "pastes" --posts posts at once; each goes through handle_message and the
+post queue to --channels fake channels on the in-memory storage backend. Reports
+deliveries and posts per second, p50/p99 delivery time (from the paste to the
+channel receiving the post) and how many requests hit a 429.
+
+Results are compared with the saved baseline for the same scenario, and the
+exit code is 1 if throughput or p99 got worse by more than --tolerance or if
+any request hit a 429.
+Run from the repository root:
+    python benchmarks/bench_broadcast.py
+    python benchmarks/bench_broadcast.py --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Must be set before the bot's modules read their configuration
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from telegram import Update
+from telegram.ext import Application
+from benchmarks.fake_bot_api import FakeBotAPI, serve_in_thread
+from config import ADMIN_USER_ID
+from bot_handlers import handle_message
+from database import async_db
+from flood_control import flood_coordinator
+from post_queue import post_queue
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline_broadcast.json")
+FAKE_TOKEN = "123456:FAKE-benchmark-token"
+POST_RE = re.compile(r"Bench post (\d+)")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def admin_update(bot, number):
+    return Update.de_json({
+        "update_id": number,
+        "message": {
+            "message_id": number,
+            "date": int(time.time()),
+            "chat": {"id": ADMIN_USER_ID, "type": "private"},
+            "from": {"id": ADMIN_USER_ID, "is_bot": False, "first_name": "Admin"},
+            "text": f"Title: Bench post {number}\nPrice: Rs. 499\nDescription: Offline benchmark post",
+        },
+    }, bot)
+
+async def run(args, api, port):
+    application = (
+        Application.builder()
+        .token(FAKE_TOKEN)
+        .base_url(f"http://127.0.0.1:{port}/bot")
+        .concurrent_updates(True)
+        .rate_limiter(flood_coordinator)
+        .build()
+    )
+    await application.initialize()
+    channels = [str(-1001000000000 - i) for i in range(args.channels)]
+    for channel_id in channels:
+        await async_db.add_channel(channel_id)
+    await post_queue.start(application.bot)
+
+    context = SimpleNamespace(bot=application.bot)
+    pasted_at = {}
+
+    async def paste(number):
+        pasted_at[number] = time.monotonic()
+        await handle_message(admin_update(application.bot, number), context)
+
+    started = time.monotonic()
+    await asyncio.gather(*(paste(number) for number in range(args.posts)))
+    expected = args.channels * args.posts
+    while True:
+        delivered = [d for d in api.deliveries if d.chat_id in channels]
+        if len(delivered) >= expected or time.monotonic() - started > args.timeout:
+            break
+        await asyncio.sleep(0.1)
+    # Let the queue send its report before shutting down
+    while await async_db.get_unfinished_jobs():
+        await asyncio.sleep(0.1)
+    await post_queue.stop()
+    await application.shutdown()
+
+    delivery_times = [d.at - pasted_at[int(POST_RE.search(d.text or "").group(1))] for d in delivered]
+    elapsed = max(d.at for d in delivered) - started if delivered else float("inf")
+    return {
+        "channels": args.channels,
+        "posts": args.posts,
+        "latency": args.latency,
+        "delivered": len(delivered),
+        "expected": expected,
+        "seconds": round(elapsed, 3),
+        "deliveries_per_second": round(len(delivered) / elapsed, 2),
+        "posts_per_second": round(args.posts / elapsed, 3),
+        "p50": round(percentile(delivery_times, 0.50), 3),
+        "p99": round(percentile(delivery_times, 0.99), 3),
+        "requests": sum(api.requests.values()),
+        "retries": sum(api.rejected.values()),
+        "flood_events": flood_coordinator.flood_events,
+    }
+
+def compare(result, baseline, tolerance):
+    """Print the change against the baseline; returns False if the run is a regression"""
+    ok = True
+    for key, higher_is_better in (("deliveries_per_second", True), ("p50", False), ("p99", False)):
+        old, new = baseline[key], result[key]
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if key in ("deliveries_per_second", "p99") and worse > tolerance:
+            flag = "  <-- regression"
+            ok = False
+        print(f"  {key:<22} {old:>10} -> {new:<10} ({change:+.1%}){flag}")
+    # The limiters should keep every request under Telegram's limits, so any 429 is a failure
+    for key in ("retries", "flood_events"):
+        old, new = baseline[key], result[key]
+        flag = ""
+        if new > 0:
+            flag = "  <-- hit flood control"
+            ok = False
+        print(f"  {key:<22} {old:>10} -> {new:<10}{flag}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end broadcast benchmark")
+    parser.add_argument("--channels", type=int, default=60)
+    parser.add_argument("--posts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake server seconds per request")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    api = FakeBotAPI(latency=args.latency)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = serve_in_thread(api, sock)
+    try:
+        result = asyncio.run(run(args, api, sock.getsockname()[1]))
+    finally:
+        server.should_exit = True
+
+    print(f"{result['posts']} post(s) to {result['channels']} channel(s), {result['latency'] * 1000:.0f} ms per request")
+    print(f"  delivered:   {result['delivered']}/{result['expected']} in {result['seconds']:.1f}s")
+    print(f"  throughput:  {result['deliveries_per_second']:.1f} deliveries/s, {result['posts_per_second']:.2f} posts/s")
+    print(f"  delivery:    p50 {result['p50']:.2f}s, p99 {result['p99']:.2f}s")
+    print(f"  requests:    {result['requests']}, 429 replies: {result['retries']}, flood pauses: {result['flood_events']}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    scenario = f"{args.channels}x{args.posts}@{args.latency}"
+    if args.save_baseline:
+        baselines[scenario] = result
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline for {scenario} to {args.baseline}")
+    elif scenario in baselines:
+        print(f"Compared with baseline {scenario}:")
+        if not compare(result, baselines[scenario], args.tolerance):
+            sys.exit(1)
+    else:
+        print(f"No baseline for {scenario}; run with --save-baseline to record one")
+    if result["delivered"] < result["expected"]:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
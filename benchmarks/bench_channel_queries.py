@@ -0,0 +1,83 @@
+"""Benchmark: channel reads against a 10k channel collection, before and after indexes/projections.
+
+Needs a reachable MongoDB; a throwaway database is created and dropped.
+Run from the repository root:
+    BENCH_MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_channel_queries.py
+"""
+import os
+import sys
+import time
+import uuid
+from pymongo import ASCENDING, MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHANNEL_COUNT = 10_000
+LOOKUPS = 500
+RUNS = 20
+
+def seed(collection):
+    # Real channel documents are small, but the old reads pulled every field back anyway
+    collection.insert_many([
+        {
+            "channel_id": f"-100{1000000000 + i}",
+            "channel_name": f"channel_{i}" if i % 2 else None,
+            "active": i % 10 != 0,
+            "notes": "x" * 200,
+        }
+        for i in range(CHANNEL_COUNT)
+    ])
+    collection.update_many({"channel_name": None}, {"$unset": {"channel_name": ""}})
+
+def legacy_reads(collection):
+    channels = list(collection.find({"active": True}))
+    ids = [channel["channel_id"] for channel in channels]
+    channels = list(collection.find({}))
+    names = [channel.get("channel_name", channel["channel_id"]) for channel in channels]
+    return ids, names
+
+def projected_reads(collection):
+    ids = [c["channel_id"] for c in collection.find({"active": True}, {"_id": 0, "channel_id": 1})]
+    names = [
+        c.get("channel_name", c["channel_id"])
+        for c in collection.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1})
+    ]
+    return ids, names
+
+def lookups(collection):
+    for i in range(0, CHANNEL_COUNT, CHANNEL_COUNT // LOOKUPS):
+        collection.find_one({"$or": [{"channel_id": f"-100{1000000000 + i}"}, {"channel_name": f"channel_{i}"}]}, {"_id": 1})
+
+def timed(func, collection, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        func(collection)
+    return (time.perf_counter() - started) / runs
+
+def main():
+    client = MongoClient(os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=5000)
+    db_name = f"bench_channels_{uuid.uuid4().hex[:8]}"
+    collection = client[db_name]["channels"]
+    try:
+        seed(collection)
+
+        legacy_list = timed(legacy_reads, collection, RUNS)
+        legacy_lookup = timed(lookups, collection, 3)
+
+        collection.create_index([("channel_id", ASCENDING)], unique=True)
+        collection.create_index([("channel_name", ASCENDING)], unique=True,
+                                partialFilterExpression={"channel_name": {"$type": "string"}})
+        collection.create_index([("active", ASCENDING)])
+        assert legacy_reads(collection) == projected_reads(collection)
+
+        projected_list = timed(projected_reads, collection, RUNS)
+        indexed_lookup = timed(lookups, collection, 3)
+
+        print(f"channels: {CHANNEL_COUNT}")
+        print(f"list reads   full docs: {legacy_list * 1000:8.1f} ms   projected: {projected_list * 1000:8.1f} ms   speedup: {legacy_list / projected_list:6.2f}x")
+        print(f"{LOOKUPS} lookups  no index: {legacy_lookup * 1000:8.1f} ms   indexed:   {indexed_lookup * 1000:8.1f} ms   speedup: {legacy_lookup / indexed_lookup:6.2f}x")
+    finally:
+        client.drop_database(db_name)
+
+if __name__ == '__main__':
+    main()
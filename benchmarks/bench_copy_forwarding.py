@@ -0,0 +1,136 @@
+"""Benchmark: per-channel send_photo vs. staging once and copying with copyMessage/copyMessages.
+
+Both runs go through the real post queue (PostQueue._stage, _chunk and _send_chunk)
+against the fake Bot API server, which enforces Telegram's global and per-chat
+limits. Each mode runs in its own process because STAGING_CHANNEL_ID is read
+at import. Reports the Bot API requests and request bytes each mode needs and
+the wall time from queueing the posts to the last channel receiving them.
+Run from the repository root:
+    python benchmarks/bench_copy_forwarding.py
+    python benchmarks/bench_copy_forwarding.py --channels 200 --posts 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Must be set before the bot's modules read their configuration
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from telegram.ext import Application
+from benchmarks.fake_bot_api import FakeBotAPI, serve_in_thread
+from database import async_db
+from flood_control import flood_coordinator
+from post_queue import post_queue
+
+FAKE_TOKEN = "123456:FAKE-benchmark-token"
+STAGING_CHANNEL = "-1009999999999"
+PHOTO_FILE_ID = "AgACAgUAAxkBAAIBY2ZfQ0x1c3RvbWVyUGhvdG9GaWxlSWRGb3JCZW5jaG1hcmtz"
+CAPTION = (
+    "<b>📌 Sample Movie (2024) 1080p WEB-DL</b>\n💰 Price: Free\n"
+    + "🔗 Link: <a href='https://example.com/sample'>https://example.com/sample</a>\n" * 6
+    + "<i>" + "A short description of the post. " * 15 + "</i>"
+)
+MODES = {
+    "send_photo": "",  # no staging channel: every channel gets its own send_photo
+    "copy_messages": STAGING_CHANNEL,
+}
+
+async def run(args, api, port):
+    application = (
+        Application.builder()
+        .token(FAKE_TOKEN)
+        .base_url(f"http://127.0.0.1:{port}/bot")
+        .rate_limiter(flood_coordinator)
+        .build()
+    )
+    await application.initialize()
+    channels = [str(-1001000000000 - i) for i in range(args.channels)]
+    for channel_id in channels:
+        await async_db.add_channel(channel_id)
+    await post_queue.start(application.bot)
+
+    started = time.monotonic()
+    for number in range(args.posts):
+        payload = {"type": "photo", "photo": PHOTO_FILE_ID, "caption": CAPTION, "parse_mode": "HTML"}
+        await post_queue.enqueue(payload, channels, None, number + 1)
+    expected = args.channels * args.posts
+    while True:
+        delivered = [d for d in api.deliveries if d.chat_id in channels]
+        if len(delivered) >= expected or time.monotonic() - started > args.timeout:
+            break
+        await asyncio.sleep(0.1)
+    while await async_db.get_unfinished_jobs():
+        await asyncio.sleep(0.1)
+    await post_queue.stop()
+    await application.shutdown()
+
+    return {
+        "delivered": len(delivered),
+        "expected": expected,
+        "seconds": round(max(d.at for d in delivered) - started, 2) if delivered else None,
+        "requests": sum(count for method, count in api.requests.items() if method != "getMe"),
+        "request_bytes": api.request_bytes,
+        "by_method": {method: count for method, count in api.requests.items() if method != "getMe"},
+        "retries": sum(api.rejected.values()),
+    }
+
+def run_mode(args):
+    """Run one mode in this process and print its result as JSON"""
+    logging.basicConfig(level=logging.WARNING)
+    api = FakeBotAPI(latency=args.latency)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = serve_in_thread(api, sock)
+    try:
+        result = asyncio.run(run(args, api, sock.getsockname()[1]))
+    finally:
+        server.should_exit = True
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-channel sends vs. staged copies through the post queue")
+    parser.add_argument("--channels", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake server seconds per request")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        run_mode(args)
+        return
+
+    print(f"{args.posts} post(s) to {args.channels} channel(s), caption {len(CAPTION)} chars, "
+          f"{args.latency * 1000:.0f} ms per request")
+    baseline = None
+    failed = False
+    for mode, staging_channel in MODES.items():
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode, "--channels", str(args.channels),
+             "--posts", str(args.posts), "--latency", str(args.latency), "--timeout", str(args.timeout)],
+            env={**os.environ, "STAGING_CHANNEL_ID": staging_channel},
+            capture_output=True, text=True, check=True,
+        )
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        baseline = baseline or result
+        failed = failed or result["delivered"] < result["expected"]
+        methods = ", ".join(f"{method} {count}" for method, count in sorted(result["by_method"].items()))
+        print(
+            f"  {mode:<14} delivered {result['delivered']}/{result['expected']} in {result['seconds']}s"
+            f" ({baseline['seconds'] / result['seconds']:.2f}x)\n"
+            f"  {'':<14} requests: {result['requests']} ({methods}), 429 replies: {result['retries']}\n"
+            f"  {'':<14} request bytes: {result['request_bytes'] / 1024:.1f} KiB"
+            f" ({result['request_bytes'] / baseline['request_bytes']:.2f}x)"
+        )
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
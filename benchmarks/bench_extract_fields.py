@@ -0,0 +1,86 @@
+"""Micro-benchmark: table-driven extract_fields vs. the original line-by-line startswith loop.
+
+Captions are grown up to Telegram's 4096 character limit. The single scan only pays off
+on long captions: it is about 3x faster near 4096 characters, while at 512 characters
+the two are within noise of each other (0.93x to 1.01x between runs).
+Run from the repository root:
+    python benchmarks/bench_extract_fields.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import extract_fields
+from formatting import URL_RE
+from benchmarks.corpus import STRUCTURED_POSTS
+
+CAPTION_LIMIT = 4096
+# Hyphenated words starting with a label; both implementations keep them as the title
+HYPHENATED_POSTS = [
+    "Price-drop alert! Boat earbuds now cheaper\nGrab fast",
+    "Name-brand sneakers at half price",
+    "Cost-effective earbuds for everyone",
+]
+
+# Original implementation from handle_message, kept verbatim as the baseline
+
+def legacy_extract(message_text):
+    lines = message_text.split('\n')
+
+    # Try to extract title, price, link, description
+    extracted_data = {
+        'title': '',
+        'price': '',
+        'link': '',
+        'description': message_text
+    }
+
+    # Simple extraction logic
+    for line in lines:
+        line = line.strip()
+        if line.startswith('Title:') or line.startswith('title:'):
+            extracted_data['title'] = line.split(':', 1)[1].strip()
+        elif line.startswith('Price:') or line.startswith('price:'):
+            extracted_data['price'] = line.split(':', 1)[1].strip()
+        elif 'http' in line:
+            # Extract URL
+            urls = URL_RE.findall(line)
+            if urls:
+                extracted_data['link'] = urls[0]
+
+    # If no specific data found, use the message as title
+    if not extracted_data['title'] and not extracted_data['price'] and not extracted_data['link']:
+        extracted_data['title'] = message_text[:100] + ('...' if len(message_text) > 100 else '')
+    return extracted_data
+
+def grow(post, limit):
+    """Pad a post with description lines until it is close to `limit` characters"""
+    filler = "Great deal with free delivery, check the link for colour and size options. https://example.com/p/123"
+    lines = post.split('\n')
+    while len('\n'.join(lines)) + len(filler) + 1 <= limit:
+        lines.append(filler)
+    return '\n'.join(lines)
+
+def main():
+    corpus = [grow(post, size) for post in STRUCTURED_POSTS for size in (512, 1024, 2048, CAPTION_LIMIT)]
+    assert all(len(caption) <= CAPTION_LIMIT for caption in corpus)
+
+    for caption in corpus + HYPHENATED_POSTS:
+        # Both read the same title; prices differ only by normalization
+        assert extract_fields(caption)['title'] == legacy_extract(caption)['title'], caption
+
+    number = 2000
+    for size in (512, CAPTION_LIMIT):
+        captions = [c for c in corpus if size // 2 < len(c) <= size]
+        legacy = timeit.timeit(lambda: [legacy_extract(c) for c in captions], number=number)
+        current = timeit.timeit(lambda: [extract_fields(c) for c in captions], number=number)
+        per_caption = 1e6 / (number * len(captions))
+        print(f"captions up to {size} chars: {len(captions)}, runs: {number}")
+        print(f"  legacy:       {legacy * per_caption:8.1f} us/caption")
+        print(f"  table-driven: {current * per_caption:8.1f} us/caption")
+        print(f"  speedup:      {legacy / current:8.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Micro-benchmark: precompiled format_movie_links vs. the original per-call re.sub version.
+
+Run from the repository root:
+    python benchmarks/bench_format_movie_links.py
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatting import format_movie_links
+from benchmarks.corpus import MOVIE_POSTS
+
+# Original implementation, kept verbatim as the baseline
+
+def legacy_format_movie_links(message_text, urls):
+    """Format movie links with special template"""
+    lines = message_text.split('\n')
+    
+    # Clean message - remove hashtags, non-terabox links, and existing format text
+    cleaned_lines = []
+    for line in lines:
+        line = line.strip()
+        # Remove hashtags
+        line = re.sub(r'#\w+', '', line).strip()
+        # Remove all extra symbols and decorative text
+        line = re.sub(r'[🎬🎭🎪🎨🎯🎲🎰🎸🎺🎻🎤🎧🎵🎶🎼🎹🎺🎸]', '', line)
+        line = re.sub(r'[⭐️✨💫⚡️🔥💥🌟💯🎉🎊🎈]', '', line)
+        line = re.sub(r'[➤➡️▶️◀️⬅️↗️↘️⬆️⬇️]', '', line)
+        line = re.sub(r'[📱💻🖥️📺📹📷📸🎥🎞️]', '', line)
+        # Skip existing format text and decorative elements
+        if ('Wᴀᴛᴄʜ Oɴʟɪɴᴇ' in line or 'Dᴏᴡɴʟᴏᴀᴅ' in line or 
+            'ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ' in line or '═══' in line or
+            '╔' in line or '╚' in line or 'Cʜᴀɴɴᴇʟ' in line or
+            'ᴍᴏᴠɪᴇ' in line.lower() or 'ꜰɪʟᴍ' in line.lower() or
+            '━━━' in line or '───' in line or '▬▬▬' in line or
+            'ꜱᴇʀɪᴇꜱ' in line.lower() or 'ᴇᴘɪꜱᴏᴅᴇ' in line.lower()):
+            continue
+        # Keep only terabox links and clean text
+        if line and ('terabox' in line.lower() or 'http' not in line):
+            cleaned_lines.append(line)
+    
+    # Start building the formatted message
+    formatted_parts = []
+    
+    # Extract title (first line) - clean up extra text and extract links if present
+    title_line = cleaned_lines[0].strip() if cleaned_lines else ""
+    start_index = 1
+    
+    if title_line:
+        # Clean title aggressively - remove all extra text
+        clean_title = title_line
+        
+        # Remove URLs first
+        clean_title = re.sub(r'https?://[^\s]+', '', clean_title)
+        
+        # Remove common prefixes and suffixes
+        clean_title = re.sub(r'(?i)(movie|film|series|episode|ep|season|s\d+|e\d+)', '', clean_title)
+        clean_title = re.sub(r'(?i)(hindi|english|dubbed|dual audio)', '', clean_title)
+        clean_title = re.sub(r'(?i)(480p|720p|1080p|4k|hd|full hd)', '', clean_title)
+        clean_title = re.sub(r'(?i)(webrip|hdcam|dvdrip|bluray|web-dl)', '', clean_title)
+        clean_title = re.sub(r'(?i)(download|watch|online|free)', '', clean_title)
+        
+        # Remove years in brackets
+        clean_title = re.sub(r'\(\d{4}\)', '', clean_title)
+        clean_title = re.sub(r'\[\d{4}\]', '', clean_title)
+        
+        # Remove file sizes
+        clean_title = re.sub(r'\d+(\.\d+)?\s*(gb|mb|kb)', '', clean_title, flags=re.IGNORECASE)
+        
+        # Remove special characters except basic ones
+        clean_title = re.sub(r'[^\w\s\-\.]', '', clean_title)
+        
+        # Clean up multiple spaces
+        clean_title = re.sub(r'\s+', ' ', clean_title).strip()
+        
+        # Only add if meaningful title remains
+        if clean_title and len(clean_title) > 5:
+            formatted_parts.append(f"<b>{clean_title}</b>")
+            formatted_parts.append("")
+    else:
+        start_index = 0
+    
+    # Add Watch/Download header
+    formatted_parts.append("<b>📥Wᴀᴛᴄʜ Oɴʟɪɴᴇ / Dᴏᴡɴʟᴏᴀᴅ</b>")
+    formatted_parts.append("")
+    
+    # Process links
+    quality_links = {'480p': [], '720p': [], '1080p': []}
+    terabox_links = []
+    
+    for line in cleaned_lines[start_index:]:
+        line = line.strip()
+        if line and 'terabox' in line.lower():
+            # Extract terabox link
+            url_pattern = r'https?://[^\s]+'
+            link_match = re.search(url_pattern, line)
+            if link_match:
+                link = link_match.group()
+                
+                # Check for quality
+                quality_found = None
+                for quality in ['480p', '720p', '1080p']:
+                    if quality in line.lower():
+                        quality_found = quality
+                        break
+                
+                if quality_found:
+                    quality_links[quality_found].append(link)
+                else:
+                    terabox_links.append(link)
+    
+    # Add quality links
+    has_quality = False
+    for quality in ['480p', '720p', '1080p']:
+        if quality_links[quality]:
+            formatted_parts.append(f"<b>{quality.upper()} - <a href='{quality_links[quality][0]}'>Download {quality.upper()}</a></b>")
+            formatted_parts.append("")
+            has_quality = True
+    
+    # Add 1080p default if no 1080p found but other qualities exist
+    if has_quality and not quality_links['1080p']:
+        formatted_parts.append("<b>1080P - ᴀᴠᴀɪʟᴀʙʟᴇ ɪɴ ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ</b>")
+        formatted_parts.append("")
+    
+    # Add links without quality
+    if not has_quality and terabox_links:
+        if len(terabox_links) == 1:
+            formatted_parts.append(f"<b>Lɪɴᴋ - <a href='{terabox_links[0]}'>Download Here</a></b>")
+            formatted_parts.append("")
+        else:
+            for i, link in enumerate(terabox_links, 1):
+                formatted_parts.append(f"<b>Pᴀʀᴛ {i} - <a href='{link}'>Download Part {i}</a></b>")
+                formatted_parts.append("")
+    
+    # Add footer with fancy box
+    formatted_parts.append("<b>╔.★. .═════════════════════╗</b>")
+    formatted_parts.append("<b>      ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ ‒ 29ʀꜱ./ᴍᴏɴᴛʜ</b>")
+    formatted_parts.append("<b>      𝐌ᴀɪɴ Cʜᴀɴɴᴇʟ - <a href='https://t.me/+uCTbb3GPc6AwNTk1'>𝐌ᴜꜱᴛ 𝐉ᴏɪɴ</a></b>")
+    formatted_parts.append("<b>╚═════════════════════. .★.╝</b>")
+    
+    return '\n'.join(formatted_parts)
+    
+
+# Pieces the randomized titles are glued from: every noise word and size unit, plus digits,
+# brackets and plain words, so tags run into each other ("free720p", "2s1.5gb")
+TITLE_PIECES = (
+    'movie film series episode ep season s e hindi english dubbed dual audio 480p 720p 1080p 4k hd full '
+    'webrip hdcam dvdrip bluray web-dl download watch online free gb mb kb GB KB Free HD . ( ) [ ] ([ ]) - '
+    '1 2 14 2024 1.5 Kantara Title Chapter One'
+).split()
+
+def random_post(rng):
+    """A post whose first line mixes title words with noise in random order and spacing"""
+    title = "".join(rng.choice(TITLE_PIECES) + rng.choice(("", "", " ")) for _ in range(rng.randint(1, 8)))
+    return f"{title} Kantara Chapter\nhttps://terabox.com/s/{rng.randint(1, 999)} 720p"
+
+def main():
+    # Randomized titles must come out exactly as the original sequence of re.sub passes left them
+    rng = random.Random(4)
+    for _ in range(20000):
+        post = random_post(rng)
+        urls = re.findall(r'https?://[^\s]+', post)
+        assert format_movie_links(post, urls) == legacy_format_movie_links(post, urls), post
+
+    # Long multi-link posts are where the old version hurt the most
+    corpus = MOVIE_POSTS + ['\n'.join(MOVIE_POSTS)] * 4
+
+    for post in corpus:
+        urls = re.findall(r'https?://[^\s]+', post)
+        assert format_movie_links(post, urls) == legacy_format_movie_links(post, urls), post
+
+    number = 200
+    legacy = timeit.timeit(lambda: [legacy_format_movie_links(p, []) for p in corpus], number=number)
+    current = timeit.timeit(lambda: [format_movie_links(p, []) for p in corpus], number=number)
+    per_post = 1e6 / (number * len(corpus))
+    print(f"posts: {len(corpus)}, runs: {number}")
+    print(f"legacy:      {legacy * per_post:8.1f} us/post")
+    print(f"precompiled: {current * per_post:8.1f} us/post")
+    print(f"speedup:     {legacy / current:8.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Sample admin posts used by the benchmarks, modelled on real channel traffic"""
+
+MOVIE_POSTS = [
+    """🎬 Pushpa 2 The Rule (2024) Hindi Dubbed 1080p WEB-DL 2.4GB #Pushpa2 #NewRelease
+━━━━━━━━━━━━━━━━━━
+📥Wᴀᴛᴄʜ Oɴʟɪɴᴇ / Dᴏᴡɴʟᴏᴀᴅ
+480p ➤ https://teraboxapp.com/s/1AbCdEfGhIjKlMn
+720p ➤ https://teraboxapp.com/s/1OpQrStUvWxYz12
+1080p ➤ https://1024terabox.com/s/1ZyXwVuTsRqPoNm
+https://t.me/joinchat/AAAAAEmovieupdates
+╔.★. .═════════════════════╗
+      ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ ‒ 29ʀꜱ./ᴍᴏɴᴛʜ
+╚═════════════════════. .★.╝""",
+    """Stree 2 [2024] Full HD Movie Download Free
+#Stree2 #Horror #Comedy
+🔥🔥 https://terabox.com/s/1strEE2linkabcdef 🔥🔥""",
+    """⭐️ Panchayat Season 3 All Episodes Hindi WEBRip 720p ⭐️
+Ep 1 https://teraboxapp.com/s/1ep1aaaaaaaa
+Ep 2 https://teraboxapp.com/s/1ep2bbbbbbbb
+Ep 3 https://teraboxapp.com/s/1ep3cccccccc
+Ep 4 https://teraboxapp.com/s/1ep4dddddddd
+Ep 5 https://teraboxapp.com/s/1ep5eeeeeeee
+Ep 6 https://teraboxapp.com/s/1ep6ffffffff
+Ep 7 https://teraboxapp.com/s/1ep7gggggggg
+Ep 8 https://teraboxapp.com/s/1ep8hhhhhhhh
+📢 Join backup: https://t.me/backupchannel""",
+    """Kalki 2898 AD (2024) Dual Audio Hindi English BluRay 480p 720p 1080p
+▬▬▬▬▬▬▬▬▬▬▬▬
+480p 650MB - https://terabox.com/s/1kalki480pxyz
+720p 1.4GB - https://terabox.com/s/1kalki720pxyz
+▬▬▬▬▬▬▬▬▬▬▬▬
+🎞️ Cʜᴀɴɴᴇʟ: @moviesdaily
+ᴍᴏᴠɪᴇ ʀᴇQᴜᴇꜱᴛ ɢʀᴏᴜᴘ: https://t.me/requestgroup""",
+    """The Family Man S02 Complete Series HDCAM
+https://www.terabox.com/s/1familyman02part1
+https://www.terabox.com/s/1familyman02part2
+https://www.terabox.com/s/1familyman02part3
+───────────
+ᴇᴘɪꜱᴏᴅᴇ 1-9 ᴀᴅᴅᴇᴅ
+https://youtube.com/watch?v=trailer123""",
+    """Jawan
+https://terabox.com/s/1jawanonlylink""",
+]
+
+STRUCTURED_POSTS = [
+    """Title: Boat Airdopes 141 Wireless Earbuds
+Price: Rs. 1,299
+Buy here https://amzn.to/3xYzAbC
+Best seller with 42 hours playback""",
+    """title: Samsung Galaxy M34 5G (6GB/128GB)
+price: ₹16,999
+https://www.flipkart.com/samsung-galaxy-m34/p/itm123
+Limited time deal, bank offers available""",
+    """Mega sale on kitchen appliances today only!
+Grab the deals before stock runs out.""",
+]
@@ -0,0 +1,169 @@
+"""Fake Telegram Bot API server for offline benchmarks.
+
+Answers the methods the bot uses when posting and enforces Telegram's broadcast
+limits: about 30 requests per second overall and 20 messages per minute in each
+group or channel. A request over a limit gets the same 429 reply Telegram sends,
+with retry_after, and is not delivered. Every accepted message is recorded with
+the time it arrived.
+
+Used by bench_broadcast.py; it can also be run on its own and pointed at with
+Application.builder().base_url("http://127.0.0.1:8081/bot"):
+    python benchmarks/fake_bot_api.py --port 8081
+"""
+import argparse
+import asyncio
+import collections
+import json
+import math
+import threading
+import time
+import urllib.parse
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+SEND_METHODS = {"sendMessage", "sendPhoto", "sendMediaGroup", "copyMessage", "copyMessages"}
+
+class SlidingWindow:
+    """At most `limit` events in any `period` seconds"""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.events = collections.deque()
+
+    def retry_after(self, now):
+        """Seconds until another event is allowed, 0 if it is allowed now"""
+        while self.events and self.events[0] <= now - self.period:
+            self.events.popleft()
+        if len(self.events) < self.limit:
+            return 0
+        return self.events[0] + self.period - now
+
+    def add(self, now):
+        self.events.append(now)
+
+class Delivery:
+    """A message the fake server accepted"""
+
+    __slots__ = ("chat_id", "message_id", "method", "text", "at")
+
+    def __init__(self, chat_id, message_id, method, text, at):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.method = method
+        self.text = text
+        self.at = at
+
+class FakeBotAPI:
+    """In-memory Bot API with Telegram-like rate limits and a fixed per-request latency"""
+
+    def __init__(self, latency=0.02, global_rate=30, chat_per_minute=20):
+        self.latency = latency
+        self.global_window = SlidingWindow(global_rate, 1.0)
+        self.chat_per_minute = chat_per_minute
+        self.chat_windows = {}
+        self.requests = collections.Counter()
+        self.request_bytes = 0
+        self.rejected = collections.Counter()
+        self.deliveries = []
+        self._message_ids = collections.Counter()
+
+    def _chat_window(self, chat_id):
+        window = self.chat_windows.get(chat_id)
+        if window is None:
+            window = self.chat_windows[chat_id] = SlidingWindow(self.chat_per_minute, 60.0)
+        return window
+
+    def _admit(self, method, chat_id):
+        """None if the request may go through, else the retry_after to send back"""
+        now = time.monotonic()
+        windows = [self.global_window]
+        # Negative ids are groups and channels, which have the per-minute limit
+        if method in SEND_METHODS and chat_id.startswith("-"):
+            windows.append(self._chat_window(chat_id))
+        wait = max(window.retry_after(now) for window in windows)
+        if wait > 0:
+            return max(1, math.ceil(wait))
+        for window in windows:
+            window.add(now)
+        return None
+
+    def _message(self, method, chat_id, text=None, photo=False):
+        self._message_ids[chat_id] += 1
+        message_id = self._message_ids[chat_id]
+        self.deliveries.append(Delivery(chat_id, message_id, method, text, time.monotonic()))
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "channel" if chat_id.startswith("-") else "private"},
+        }
+        if photo:
+            message["photo"] = [{"file_id": f"fake-photo-{chat_id}-{message_id}", "file_unique_id": f"u{message_id}",
+                                 "width": 1280, "height": 720}]
+            message["caption"] = text or ""
+        else:
+            message["text"] = text or ""
+        return message
+
+    def _result(self, method, params):
+        chat_id = str(params.get("chat_id", ""))
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method == "sendPhoto":
+            return self._message(method, chat_id, params.get("caption"), photo=True)
+        if method == "sendMessage":
+            return self._message(method, chat_id, params.get("text"))
+        if method == "editMessageText":
+            return self._message(method, chat_id, params.get("text"))
+        if method == "sendMediaGroup":
+            media = json.loads(params["media"])
+            return [self._message(method, chat_id, item.get("caption"), photo=True) for item in media]
+        if method == "copyMessage":
+            return {"message_id": self._message(method, chat_id)["message_id"]}
+        if method == "copyMessages":
+            ids = json.loads(params["message_ids"])
+            return [{"message_id": self._message(method, chat_id)["message_id"]} for _ in ids]
+        return True
+
+    async def handle(self, request):
+        method = request.path_params["method"]
+        # The bot sends form-encoded parameters (no file uploads in these benchmarks)
+        body = await request.body()
+        params = dict(urllib.parse.parse_qsl(body.decode()))
+        self.requests[method] += 1
+        self.request_bytes += len(body)
+        await asyncio.sleep(self.latency)
+
+        retry_after = self._admit(method, str(params.get("chat_id", "")))
+        if retry_after is not None:
+            self.rejected[method] += 1
+            return JSONResponse({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            }, status_code=429)
+        return JSONResponse({"ok": True, "result": self._result(method, params)})
+
+    def app(self):
+        return Starlette(routes=[Route("/bot{token}/{method}", self.handle, methods=["GET", "POST"])])
+
+def serve_in_thread(api, sock):
+    """Serve `api` on a bound socket from a daemon thread; returns the uvicorn server once it is up"""
+    server = uvicorn.Server(uvicorn.Config(api.app(), log_level="warning"))
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve(sockets=[sock])), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every request")
+    args = parser.parse_args()
+    uvicorn.run(FakeBotAPI(latency=args.latency).app(), host="127.0.0.1", port=args.port, log_level="info")
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,52 @@
+import html
 import logging
-import re
 import traceback
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes, ConversationHandler
-from database import db
-from config import ADMIN_USER_ID, WELCOME_IMAGES
+from database import async_db
+from config import ADMIN_USER_ID, WELCOME_IMAGES, DEFAULT_POST_IMAGE, SCHEDULE_TIMEZONE
+from albums import album_media, media_groups
+from broadcaster import send_photo_cached
+from post_queue import post_queue
+from scheduler import ScheduleWindow
+from formatting import URL_RE, format_movie_links
+from extractor import extract_fields
+from templates import FILTERS, SAMPLE_VALUES, TemplateError, template_cache
+from menus import (
+    callback_router, edit_memo, channels_key, channels_menu, main_menu_keyboard, admin_menu_keyboard, schedule_menu,
+    HELP, MAIN_MENU, SETTINGS, MANAGE_CHANNELS, ALL_CHANNELS, ADD_CHANNEL, REMOVE_CHANNEL, TOGGLE_CHANNEL,
+    TOGGLE_AUTO_FORWARD, SCHEDULE_MENU, TOGGLE_SCHEDULE, ADJUST_SCHEDULE,
+    SETTINGS_TEXT, SETTINGS_KEYBOARD, MANAGE_CHANNELS_TEXT, MANAGE_CHANNELS_KEYBOARD,
+    ADD_CHANNEL_TEXT, REMOVE_CHANNEL_TEXT, BACK_TO_CHANNELS_KEYBOARD
+)
 import asyncio
 
 # Simple state tracking - no conversation handler needed
 
+HELP_TEXT = """
+🤖 <b>Bot Help</b>
+
+<b>Public Commands:</b>
+• /start - Show main menu
+• /help - Show this help message
+
+<b>Admin Commands:</b>
+• /addchannel @channel_id [Name] - Add channel for posting
+• /removechannel Channel Name/ID - Remove channel
+• /listchannels - List all channels
+• /format - Set post format
+• /settings - Bot settings
+
+<b>Format Variables:</b>
+You can use these variables in your format:
+• {title} - Post title
+• {price} - Item price
+• {link} - Link URL
+• {description} - Description
+Add filters like {title|truncate:80|escape} or {price|default:Free}
+"""
+
 def is_admin(user_id):
     """Check if user is admin with error handling"""
     try:
@@ -17,134 +55,6 @@ def is_admin(user_id):
         logging.error(f"Error checking admin status: {e}")
         return False
 
-def format_movie_links(message_text, urls):
-    """Format movie links with special template"""
-    lines = message_text.split('\n')
-    
-    # Clean message - remove hashtags, non-terabox links, and existing format text
-    cleaned_lines = []
-    for line in lines:
-        line = line.strip()
-        # Remove hashtags
-        line = re.sub(r'#\w+', '', line).strip()
-        # Remove all extra symbols and decorative text
-        line = re.sub(r'[🎬🎭🎪🎨🎯🎲🎰🎸🎺🎻🎤🎧🎵🎶🎼🎹🎺🎸]', '', line)
-        line = re.sub(r'[⭐️✨💫⚡️🔥💥🌟💯🎉🎊🎈]', '', line)
-        line = re.sub(r'[➤➡️▶️◀️⬅️↗️↘️⬆️⬇️]', '', line)
-        line = re.sub(r'[📱💻🖥️📺📹📷📸🎥🎞️]', '', line)
-        # Skip existing format text and decorative elements
-        if ('Wᴀᴛᴄʜ Oɴʟɪɴᴇ' in line or 'Dᴏᴡɴʟᴏᴀᴅ' in line or 
-            'ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ' in line or '═══' in line or
-            '╔' in line or '╚' in line or 'Cʜᴀɴɴᴇʟ' in line or
-            'ᴍᴏᴠɪᴇ' in line.lower() or 'ꜰɪʟᴍ' in line.lower() or
-            '━━━' in line or '───' in line or '▬▬▬' in line or
-            'ꜱᴇʀɪᴇꜱ' in line.lower() or 'ᴇᴘɪꜱᴏᴅᴇ' in line.lower()):
-            continue
-        # Keep only terabox links and clean text
-        if line and ('terabox' in line.lower() or 'http' not in line):
-            cleaned_lines.append(line)
-    
-    # Start building the formatted message
-    formatted_parts = []
-    
-    # Extract title (first line) - clean up extra text and extract links if present
-    title_line = cleaned_lines[0].strip() if cleaned_lines else ""
-    start_index = 1
-    
-    if title_line:
-        # Clean title aggressively - remove all extra text
-        clean_title = title_line
-        
-        # Remove URLs first
-        clean_title = re.sub(r'https?://[^\s]+', '', clean_title)
-        
-        # Remove common prefixes and suffixes
-        clean_title = re.sub(r'(?i)(movie|film|series|episode|ep|season|s\d+|e\d+)', '', clean_title)
-        clean_title = re.sub(r'(?i)(hindi|english|dubbed|dual audio)', '', clean_title)
-        clean_title = re.sub(r'(?i)(480p|720p|1080p|4k|hd|full hd)', '', clean_title)
-        clean_title = re.sub(r'(?i)(webrip|hdcam|dvdrip|bluray|web-dl)', '', clean_title)
-        clean_title = re.sub(r'(?i)(download|watch|online|free)', '', clean_title)
-        
-        # Remove years in brackets
-        clean_title = re.sub(r'\(\d{4}\)', '', clean_title)
-        clean_title = re.sub(r'\[\d{4}\]', '', clean_title)
-        
-        # Remove file sizes
-        clean_title = re.sub(r'\d+(\.\d+)?\s*(gb|mb|kb)', '', clean_title, flags=re.IGNORECASE)
-        
-        # Remove special characters except basic ones
-        clean_title = re.sub(r'[^\w\s\-\.]', '', clean_title)
-        
-        # Clean up multiple spaces
-        clean_title = re.sub(r'\s+', ' ', clean_title).strip()
-        
-        # Only add if meaningful title remains
-        if clean_title and len(clean_title) > 5:
-            formatted_parts.append(f"<b>{clean_title}</b>")
-            formatted_parts.append("")
-    else:
-        start_index = 0
-    
-    # Add Watch/Download header
-    formatted_parts.append("<b>📥Wᴀᴛᴄʜ Oɴʟɪɴᴇ / Dᴏᴡɴʟᴏᴀᴅ</b>")
-    formatted_parts.append("")
-    
-    # Process links
-    quality_links = {'480p': [], '720p': [], '1080p': []}
-    terabox_links = []
-    
-    for line in cleaned_lines[start_index:]:
-        line = line.strip()
-        if line and 'terabox' in line.lower():
-            # Extract terabox link
-            url_pattern = r'https?://[^\s]+'
-            link_match = re.search(url_pattern, line)
-            if link_match:
-                link = link_match.group()
-                
-                # Check for quality
-                quality_found = None
-                for quality in ['480p', '720p', '1080p']:
-                    if quality in line.lower():
-                        quality_found = quality
-                        break
-                
-                if quality_found:
-                    quality_links[quality_found].append(link)
-                else:
-                    terabox_links.append(link)
-    
-    # Add quality links
-    has_quality = False
-    for quality in ['480p', '720p', '1080p']:
-        if quality_links[quality]:
-            formatted_parts.append(f"<b>{quality.upper()} - <a href='{quality_links[quality][0]}'>Download {quality.upper()}</a></b>")
-            formatted_parts.append("")
-            has_quality = True
-    
-    # Add 1080p default if no 1080p found but other qualities exist
-    if has_quality and not quality_links['1080p']:
-        formatted_parts.append("<b>1080P - ᴀᴠᴀɪʟᴀʙʟᴇ ɪɴ ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ</b>")
-        formatted_parts.append("")
-    
-    # Add links without quality
-    if not has_quality and terabox_links:
-        if len(terabox_links) == 1:
-            formatted_parts.append(f"<b>Lɪɴᴋ - <a href='{terabox_links[0]}'>Download Here</a></b>")
-            formatted_parts.append("")
-        else:
-            for i, link in enumerate(terabox_links, 1):
-                formatted_parts.append(f"<b>Pᴀʀᴛ {i} - <a href='{link}'>Download Part {i}</a></b>")
-                formatted_parts.append("")
-    
-    # Add footer with fancy box
-    formatted_parts.append("<b>╔.★. .═════════════════════╗</b>")
-    formatted_parts.append("<b>      ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ ‒ 29ʀꜱ./ᴍᴏɴᴛʜ</b>")
-    formatted_parts.append("<b>      𝐌ᴀɪɴ Cʜᴀɴɴᴇʟ - <a href='https://t.me/+uCTbb3GPc6AwNTk1'>𝐌ᴜꜱᴛ 𝐉ᴏɪɴ</a></b>")
-    formatted_parts.append("<b>╚═════════════════════. .★.╝</b>")
-    
-    return '\n'.join(formatted_parts)
-
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
     try:
@@ -152,21 +62,9 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         user_id = update.effective_user.id
         user_name = update.effective_user.first_name or "User"
-        start_message = db.get_start_message().format(user_name)
-        
-        # Create keyboard
-        keyboard = []
-        
-        if is_admin(user_id):
-            keyboard = [
-                [InlineKeyboardButton("Manage Channels", callback_data="manage_channels"), InlineKeyboardButton("Help", callback_data="help")]
-            ]
-        else:
-            keyboard = [
-                [InlineKeyboardButton("Help", callback_data="help")]
-            ]
+        start_message = (await async_db.get_start_message()).format(user_name)
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = main_menu_keyboard(is_admin(user_id))
         
         if update.message:
             # Alternate between the two welcome images
@@ -176,8 +74,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             # Send welcome image with message as caption
             try:
-                await update.message.reply_photo(
-                    photo=selected_image,
+                await send_photo_cached(
+                    update.message.reply_photo,
+                    selected_image,
+                    context.bot.id,
                     caption=start_message,
                     parse_mode='HTML',
                     reply_markup=reply_markup
@@ -199,30 +99,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /help command"""
     if not update.message:
         return
-        
-    help_text = """
-🤖 <b>Bot Help</b>
-
-<b>Public Commands:</b>
-• /start - Show main menu
-• /help - Show this help message
-
-<b>Admin Commands:</b>
-• /addchannel @channel_id [Name] - Add channel for posting
-• /removechannel Channel Name/ID - Remove channel
-• /listchannels - List all channels
-• /format - Set post format
-• /settings - Bot settings
-
-<b>Format Variables:</b>
-You can use these variables in your format:
-• {title} - Post title
-• {price} - Item price
-• {link} - Link URL
-• {description} - Description
-"""
     
-    await update.message.reply_text(help_text, parse_mode='HTML')
+    await update.message.reply_text(HELP_TEXT, parse_mode='HTML')
 
 async def add_channel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /addchannel command"""
@@ -254,7 +132,7 @@ async def add_channel_command(update: Update, context: ContextTypes.DEFAULT_TYPE
             await update.message.reply_text("❌ Invalid channel ID format. Use @channel_username or -100xxxxxxxxx")
             return
             
-        success, message = db.add_channel_with_name(channel_id, channel_name)
+        success, message = await async_db.add_channel_with_name(channel_id, channel_name)
     else:
         await update.message.reply_text("❌ Please use format: /addchannel @channel_id [Channel Name]")
         return
@@ -285,10 +163,10 @@ async def remove_channel_command(update: Update, context: ContextTypes.DEFAULT_T
     # Check if input looks like a channel ID
     if input_text.startswith('@') or input_text.startswith('-100') or input_text.lstrip('-').isdigit():
         # It's a channel ID
-        success, message = db.remove_channel(input_text)
+        success, message = await async_db.remove_channel(input_text)
     else:
         # It's a channel name
-        success, message = db.remove_channel_by_name(input_text)
+        success, message = await async_db.remove_channel_by_name(input_text)
     
     if success:
         await update.message.reply_text(f"✅ {message}")
@@ -306,7 +184,7 @@ async def list_channels_command(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("❌ You don't have permission to use this command.")
         return
     
-    channels = db.get_channels_display(active_only=False)
+    channels = await async_db.get_channels_display(active_only=False)
     
     if not channels:
         await update.message.reply_text("📭 No channels configured.")
@@ -329,15 +207,33 @@ async def format_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ You don't have permission to use this command.")
         return
     
-    current_format = db.get_format()
+    # /format <template> sets a new format; the template may span several lines
+    parts = (update.message.text or "").split(None, 1)
+    if len(parts) > 1:
+        new_format = parts[1]
+        success, message = await async_db.set_format(new_format)
+        if not success:
+            await update.message.reply_text(f"❌ {message}")
+            return
+        preview = template_cache.get(*await async_db.get_format_with_version()).render(SAMPLE_VALUES)
+        try:
+            await update.message.reply_text(f"✅ {message}\n\nPreview:\n{preview}", parse_mode='HTML')
+        except BadRequest as e:
+            await update.message.reply_text(f"✅ {message}\n\n⚠️ Telegram can't parse this format as HTML, posts will fail: {e.message}")
+        return
+    
+    current_format = await async_db.get_format()
     
     await update.message.reply_text(
-        f"📝 <b>Current Format:</b>\n\n<pre>{current_format}</pre>\n\n"
+        f"📝 <b>Current Format:</b>\n\n<pre>{html.escape(current_format)}</pre>\n\n"
         "<b>Available variables:</b>\n"
         "• {title} - Post title\n"
         "• {price} - Item price\n"
         "• {link} - Link URL\n"
-        "• {description} - Description",
+        "• {description} - Description\n\n"
+        "<b>Filters:</b> {title|truncate:80|escape}, {price|default:Free}, {title|smallcaps}\n"
+        f"Available: {', '.join(FILTERS)}\n\n"
+        "Send <code>/format your template</code> to change it.",
         parse_mode='HTML'
     )
 
@@ -355,10 +251,17 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Check if auto forward is enabled
-    if not db.get_auto_forward_status():
+    if not await async_db.get_auto_forward_status():
         await update.message.reply_text("🚀 Auto forward is currently disabled. Enable it in Settings to auto-post messages.")
         return
     
+    if update.message.media_group_id:
+        # Albums arrive as one update per photo; the first item's handler collects the rest
+        album = await media_groups.collect(update.message)
+        if album:
+            await post_album(album)
+        return
+    
     # Get message content (text or caption)
     message_text = update.message.text or update.message.caption or ""
     
@@ -366,8 +269,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     has_photo = update.message.photo is not None
     photo_file_id = update.message.photo[-1].file_id if has_photo and update.message.photo else None
     
-    # Default image URL for text-only messages
-    default_image_url = "https://files.catbox.moe/9i18yn.jpg"
+    # Text-only messages are posted with the default image
+    photo = photo_file_id if has_photo and photo_file_id else DEFAULT_POST_IMAGE
     
     logging.info(f"Message text: {message_text}")
     logging.info(f"Has photo: {has_photo}")
@@ -376,577 +279,238 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logging.info("No message text found")
         return
     
-    # Check if it's a format bypass (contains links)
-    url_pattern = r'https?://[^\s]+'
-    urls = re.findall(url_pattern, message_text)
-    
-    logging.info(f"URLs found: {urls}")
-    
-    if urls:
-        # Auto-format with movie/content template
-        logging.info("Applying movie format")
-        formatted_message = format_movie_links(message_text, urls)
-        logging.info(f"Formatted message: {formatted_message}")
-    else:
-        # Try to extract information from the message
-        lines = message_text.split('\n')
-        
-        # Try to extract title, price, link, description
-        extracted_data = {
-            'title': '',
-            'price': '',
-            'link': '',
-            'description': message_text
-        }
-        
-        # Simple extraction logic
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Title:') or line.startswith('title:'):
-                extracted_data['title'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Price:') or line.startswith('price:'):
-                extracted_data['price'] = line.split(':', 1)[1].strip()
-            elif 'http' in line:
-                # Extract URL
-                urls = re.findall(url_pattern, line)
-                if urls:
-                    extracted_data['link'] = urls[0]
-        
-        # If no specific data found, use the message as title
-        if not extracted_data['title'] and not extracted_data['price'] and not extracted_data['link']:
-            extracted_data['title'] = message_text[:100] + ('...' if len(message_text) > 100 else '')
-        
-        # Get current format and apply it
-        current_format = db.get_format()
-        
-        try:
-            formatted_message = current_format.format(**extracted_data)
-        except KeyError as e:
-            # If format contains variables not in extracted_data, use original message
-            formatted_message = message_text
+    formatted_message = await format_post(message_text)
     
     # Get active channels and post to them
-    channels = db.get_channels(active_only=True)
+    channels = await async_db.get_channels(active_only=True)
     
     if not channels:
         # No channels configured - just send formatted message as reply
         logging.info("No channels configured, sending as reply")
-        if has_photo and photo_file_id:
-            await update.message.reply_photo(
-                photo=photo_file_id,
-                caption=formatted_message,
-                parse_mode='HTML'
-            )
-        else:
-            # For text messages, send with default image
-            await update.message.reply_photo(
-                photo=default_image_url,
-                caption=formatted_message,
-                parse_mode='HTML'
-            )
+        await send_photo_cached(
+            update.message.reply_photo,
+            photo,
+            context.bot.id,
+            caption=formatted_message,
+            parse_mode='HTML'
+        )
         return
     
-    success_count = 0
-    failed_channels = []
-    
     # Send to user first (as preview)
+    # (this also fills the file_id cache so the fan-out below doesn't re-send the image URL)
     try:
-        if has_photo and photo_file_id:
-            await update.message.reply_photo(
-                photo=photo_file_id,
-                caption=formatted_message,
-                parse_mode='HTML'
-            )
-        else:
-            # For text messages, show preview with default image
-            await update.message.reply_photo(
-                photo=default_image_url,
-                caption=formatted_message,
-                parse_mode='HTML'
-            )
+        await send_photo_cached(
+            update.message.reply_photo,
+            photo,
+            context.bot.id,
+            caption=formatted_message,
+            parse_mode='HTML'
+        )
     except Exception as e:
         logging.error(f"Failed to send preview to user: {e}")
     
-    # Add delay between channels to avoid overwhelming Telegram
-    for i, channel_id in enumerate(channels):
-        if i > 0:  # Add delay between channels (except first one)
-            await asyncio.sleep(1)  # 1 second between channels
-            
-        posted_successfully = False
-        last_error = None
-        
-        # Try up to 3 times for each channel
-        for attempt in range(1, 4):  # 3 attempts total
-            try:
-                if has_photo and photo_file_id:
-                    await context.bot.send_photo(
-                        chat_id=channel_id,
-                        photo=photo_file_id,
-                        caption=formatted_message,
-                        parse_mode='HTML'
-                    )
-                else:
-                    # For text messages, send with default image
-                    await context.bot.send_photo(
-                        chat_id=channel_id,
-                        photo=default_image_url,
-                        caption=formatted_message,
-                        parse_mode='HTML'
-                    )
-                
-                # If we reach here, posting was successful
-                posted_successfully = True
-                success_count += 1
-                if attempt > 1:
-                    logging.info(f"Successfully posted to channel {channel_id} on attempt {attempt}")
-                break  # Exit retry loop on success
-                
-            except Exception as e:
-                last_error = e
-                error_msg = str(e)
-                logging.warning(f"Attempt {attempt}/3 failed for channel {channel_id}: {error_msg}")
-                
-                # If this is not the last attempt, handle specific errors appropriately
-                if attempt < 3:
-                    wait_time = 2  # Default wait time
-                    
-                    # Handle specific Telegram API errors
-                    if "Flood control exceeded" in error_msg:
-                        # Extract wait time from flood control message
-                        flood_match = re.search(r'Retry in (\d+) seconds', error_msg)
-                        if flood_match:
-                            wait_time = int(flood_match.group(1)) + 3  # Add 3 second buffer for safety
-                            logging.info(f"Flood control detected, waiting {wait_time} seconds for channel {channel_id}")
-                        else:
-                            wait_time = 30  # Longer default flood control wait time
-                    elif "Timed out" in error_msg:
-                        wait_time = 5  # Longer wait for timeout errors
-                        logging.info(f"Timeout detected, waiting {wait_time} seconds for channel {channel_id}")
-                    elif "Bad Request" in error_msg:
-                        wait_time = 1  # Shorter wait for bad requests
-                    elif "Too Many Requests" in error_msg:
-                        wait_time = 10  # Wait longer for rate limiting
-                    
-                    await asyncio.sleep(wait_time)
-        
-        # If all attempts failed, add to failed channels with specific error info
-        if not posted_successfully:
-            error_msg = str(last_error) if last_error else "Unknown error"
-            logging.error(f"Failed to send to channel {channel_id} after 3 attempts. Last error: {error_msg}")
-            
-            # Categorize the error for better user feedback
-            if "Flood control exceeded" in error_msg:
-                failed_channels.append(f"{channel_id} (Rate limited - try again later)")
-            elif "Timed out" in error_msg:
-                failed_channels.append(f"{channel_id} (Connection timeout)")
-            elif "Bad Request" in error_msg or "Chat not found" in error_msg:
-                failed_channels.append(f"{channel_id} (Invalid channel/permissions)")
-            elif "Too Many Requests" in error_msg:
-                failed_channels.append(f"{channel_id} (API rate limit)")
-            else:
-                failed_channels.append(f"{channel_id} (Unknown error)")
-            
-            # Add longer delay after failed channel to avoid further rate limiting
-            if i < len(channels) - 1:  # Not the last channel
-                await asyncio.sleep(3)  # 3 second delay after failed channel
-    
-    # Send detailed confirmation to admin
-    if success_count > 0:
-        result_message = f"✅ Message posted to {success_count} channel(s)"
-        if failed_channels:
-            result_message += f"\n\n❌ Failed channels after 3 attempts:"
-            for failed in failed_channels:
-                result_message += f"\n• {failed}"
-            result_message += f"\n\n💡 Check channel permissions and try again later for failed channels."
-        await update.message.reply_text(result_message)
-    else:
-        await update.message.reply_text("❌ Failed to post to any channels after 3 attempts each.\n\n🔍 Common issues:\n• Bot not added to channel\n• No posting permissions\n• Rate limiting\n• Invalid channel ID\n\nCheck your channel settings and try again.")
+    payload = {"type": "photo", "photo": photo, "caption": formatted_message, "parse_mode": "HTML"}
+    await queue_post(update.message, payload, channels)
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle button callbacks"""
-    query = update.callback_query
-    if not query or not query.from_user:
-        return
-        
-    await query.answer()
-    
-    user_id = query.from_user.id
-    data = query.data
-    
-    if data == "help":
-        await help_command(update, context)
-    
-    elif data == "settings" and is_admin(user_id):
-        # Dummy settings button - just shows a message
-        keyboard = [
-            [InlineKeyboardButton("🔙 Back", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        try:
-            await query.edit_message_text(
-                "⚙️ <b>Settings</b>\n\nThis is a dummy settings menu. All main features are available directly from the main menu!",
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception:
-            # If it's a photo message, edit the caption instead
-            try:
-                await query.edit_message_caption(
-                    caption="⚙️ <b>Settings</b>\n\nThis is a dummy settings menu. All main features are available directly from the main menu!",
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            except Exception:
-                # Fallback: send new message if editing fails
-                if query.message and hasattr(query.message, 'reply_text'):
-                    await query.message.reply_text(
-                        "⚙️ <b>Settings</b>\n\nThis is a dummy settings menu. All main features are available directly from the main menu!",
-                        parse_mode='HTML',
-                        reply_markup=reply_markup
-                    )
-    
-    elif data == "manage_channels" and is_admin(user_id):
-        keyboard = [
-            [InlineKeyboardButton("📋 All Channels", callback_data="show_all_channels")],
-            [InlineKeyboardButton("➕ Add Channel", callback_data="add_channel"), InlineKeyboardButton("➖ Remove Channel", callback_data="remove_channel")],
-            [InlineKeyboardButton("🔙 Back", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Edit the photo caption instead of creating new message
-        try:
-            await query.edit_message_caption(
-                caption="📢 <b>Channel Management</b>\n\nChoose an option:",
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception as e:
-            # Fallback for text messages
-            try:
-                await query.edit_message_text(
-                    "📢 <b>Channel Management</b>\n\nChoose an option:",
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            except Exception:
-                # If both edit methods fail, silently continue
-                pass
-    
-    elif data == "show_all_channels" and is_admin(user_id):
-        channels = db.get_all_channels_with_status()
-        
-        if not channels:
-            try:
-                await query.edit_message_caption(
-                    caption="📭 <b>No channels configured</b>\n\nUse Add Channel option to add channels.",
-                    parse_mode='HTML',
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_channels")]])
-                )
-            except Exception:
-                await query.edit_message_text(
-                    "📭 <b>No channels configured</b>\n\nUse Add Channel option to add channels.",
-                    parse_mode='HTML',
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_channels")]])
-                )
+async def post_album(messages):
+    """Format and broadcast a collected album so each channel gets it in one send_media_group call"""
+    first = messages[0]
+    photos = [message.photo[-1].file_id for message in messages if message.photo]
+    caption_text = next((message.caption for message in messages if message.caption), "")
+    caption = await format_post(caption_text) if caption_text else ""
+    logging.info(f"Album {first.media_group_id} collected with {len(photos)} photo(s)")
+    
+    if len(photos) < 2:
+        # Telegram needs at least two items for a media group
+        if not photos:
             return
-        
-        channel_text = "📢 <b>All Channels</b>\n\nClick to toggle forwarding:\n\n"
-        keyboard = []
-        
-        for channel_data in channels:
-            channel_id = channel_data['channel_id']
-            channel_name = channel_data['channel_name']
-            is_active = channel_data['active']
-            status_icon = "✅" if is_active else "❌"
-            status_text = "Active" if is_active else "Inactive"
-            
-            # Add channel name to text
-            channel_text += f"<code>{channel_name}</code> - {status_text}\n"
-            
-            # Add toggle button for each channel (use display name but toggle by ID)
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"{status_icon} {channel_name}", 
-                    callback_data=f"toggle_{channel_id}"
-                )
-            ])
-        
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back", callback_data="manage_channels")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        try:
-            await query.edit_message_caption(
-                caption=channel_text,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception:
-            await query.edit_message_text(
-                channel_text,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-    
-    elif data == "add_channel" and is_admin(user_id):
-        try:
-            await query.edit_message_caption(
-                caption="➕ <b>Add Channel</b>\n\nUse the command: <code>/addchannel @channel_id [Channel Name]</code>\n\nExample:\n<code>/addchannel @mychannel [My Movie Channel]</code>",
-                parse_mode='HTML',
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_channels")]])
-            )
-        except Exception:
-            await query.edit_message_text(
-                "➕ <b>Add Channel</b>\n\nUse the command: <code>/addchannel @channel_id [Channel Name]</code>\n\nExample:\n<code>/addchannel @mychannel [My Movie Channel]</code>",
-                parse_mode='HTML',
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_channels")]])
-            )
-    
-    elif data == "remove_channel" and is_admin(user_id):
-        try:
-            await query.edit_message_caption(
-                caption="➖ <b>Remove Channel</b>\n\nUse the command: <code>/removechannel Channel Name</code> or <code>/removechannel @channel_id</code>\n\nExamples:\n<code>/removechannel My Movie Channel</code>\n<code>/removechannel @mychannel</code>",
-                parse_mode='HTML',
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_channels")]])
-            )
-        except Exception:
-            await query.edit_message_text(
-                "➖ <b>Remove Channel</b>\n\nUse the command: <code>/removechannel Channel Name</code> or <code>/removechannel @channel_id</code>\n\nExamples:\n<code>/removechannel My Movie Channel</code>\n<code>/removechannel @mychannel</code>",
-                parse_mode='HTML',
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_channels")]])
-            )
+        payload = {"type": "photo", "photo": photos[0], "caption": caption, "parse_mode": "HTML"}
+    else:
+        payload = {"type": "album", "media": photos, "caption": caption, "parse_mode": "HTML"}
     
-    elif data and data.startswith("toggle_") and is_admin(user_id):
-        channel_id = data.replace("toggle_", "")
-        success, message = db.toggle_channel(channel_id)
-        
-        if success:
-            await query.answer(f"✅ {message}")
-            # Refresh the All Channels view to show updated status
-            channels = db.get_all_channels_with_status()
-            
-            if not channels:
-                return
-            
-            channel_text = "📢 <b>All Channels</b>\n\nClick to toggle forwarding:\n\n"
-            keyboard = []
-            
-            for channel_data in channels:
-                ch_id = channel_data['channel_id']
-                ch_name = channel_data['channel_name']
-                is_active = channel_data['active']
-                status_icon = "✅" if is_active else "❌"
-                status_text = "Active" if is_active else "Inactive"
-                
-                # Add channel name to text
-                channel_text += f"<code>{ch_name}</code> - {status_text}\n"
-                
-                # Add toggle button for each channel (use display name but toggle by ID)
-                keyboard.append([
-                    InlineKeyboardButton(
-                        f"{status_icon} {ch_name}", 
-                        callback_data=f"toggle_{ch_id}"
-                    )
-                ])
-            
-            # Add back button
-            keyboard.append([InlineKeyboardButton("🔙 Back", callback_data="manage_channels")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            try:
-                await query.edit_message_caption(
-                    caption=channel_text,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            except Exception:
-                await query.edit_message_text(
-                    channel_text,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
+    # Preview first, like single posts
+    try:
+        if payload["type"] == "album":
+            await first.reply_media_group(album_media(payload))
         else:
-            await query.answer(f"❌ {message}")
-    
-    elif data == "toggle_auto_forward" and is_admin(user_id):
-        success, message = db.toggle_auto_forward()
-        await query.answer(f"✅ {message}" if success else f"❌ {message}")
-        # Refresh main menu to show updated status
-        user_name = query.from_user.first_name or "User"
-        start_message = db.get_start_message().format(user_name)
-        
-        # Get current settings status for direct display
-        auto_forward_status = "🟢 ON" if db.get_auto_forward_status() else "🔴 OFF"
-        timer_settings = db.get_schedule_timer()
-        timer_status = "🟢 ON" if timer_settings["enabled"] else "🔴 OFF"
-        
-        keyboard = [
-            [InlineKeyboardButton("Manage Channels", callback_data="manage_channels")],
-            [InlineKeyboardButton(f"🚀 Auto Forward: {auto_forward_status}", callback_data="toggle_auto_forward")],
-            [InlineKeyboardButton(f"⏰ Schedule Timer: {timer_status}", callback_data="schedule_menu")],
-            [InlineKeyboardButton("📊 Settings", callback_data="settings")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        try:
-            await query.edit_message_caption(
-                caption=start_message,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception:
-            try:
-                await query.edit_message_text(
-                    start_message,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            except Exception:
-                pass
+            await first.reply_photo(photo=payload["photo"], caption=caption, parse_mode='HTML')
+    except Exception as e:
+        logging.error(f"Failed to send album preview to user: {e}")
     
-    elif data == "schedule_menu" and is_admin(user_id):
-        timer_settings = db.get_schedule_timer()
-        timer_status = "🟢 ON" if timer_settings["enabled"] else "🔴 OFF"
-        timer_time = f"{timer_settings['hours']:02d}:{timer_settings['minutes']:02d}"
-        
-        keyboard = [
-            [InlineKeyboardButton(f"🔄 Toggle Timer: {timer_status}", callback_data="toggle_schedule_timer")],
-            [InlineKeyboardButton("🕐 Set Hour +", callback_data="hour_plus"), InlineKeyboardButton("🕐 Set Hour -", callback_data="hour_minus")],
-            [InlineKeyboardButton("🕕 Set Minute +", callback_data="minute_plus"), InlineKeyboardButton("🕕 Set Minute -", callback_data="minute_minus")],
-            [InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        try:
-            await query.edit_message_text(
-                f"⏰ <b>Schedule Timer Settings</b>\n\nCurrent Time: <code>{timer_time}</code>\nStatus: {timer_status}\n\nThis timer controls when auto-posting is active.",
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception:
-            # If it's a photo message, edit the caption instead
-            try:
-                await query.edit_message_caption(
-                    caption=f"⏰ <b>Schedule Timer Settings</b>\n\nCurrent Time: <code>{timer_time}</code>\nStatus: {timer_status}\n\nThis timer controls when auto-posting is active.",
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            except Exception:
-                # Fallback: send new message if editing fails
-                if query.message and hasattr(query.message, 'reply_text'):
-                    await query.message.reply_text(
-                        f"⏰ <b>Schedule Timer Settings</b>\n\nCurrent Time: <code>{timer_time}</code>\nStatus: {timer_status}\n\nThis timer controls when auto-posting is active.",
-                        parse_mode='HTML',
-                        reply_markup=reply_markup
-                    )
+    channels = await async_db.get_channels(active_only=True)
+    if channels:
+        await queue_post(first, payload, channels)
+
+async def format_post(message_text):
+    """Apply the movie link layout or the admin's format template to a post's text"""
+    # Check if it's a format bypass (contains links)
+    urls = URL_RE.findall(message_text)
     
-    elif data == "toggle_schedule_timer" and is_admin(user_id):
-        success, message = db.toggle_schedule_timer()
-        await query.answer(f"✅ {message}" if success else f"❌ {message}")
-        # Refresh schedule menu
-        timer_settings = db.get_schedule_timer()
-        timer_status = "🟢 ON" if timer_settings["enabled"] else "🔴 OFF"
-        timer_time = f"{timer_settings['hours']:02d}:{timer_settings['minutes']:02d}"
-        
-        keyboard = [
-            [InlineKeyboardButton(f"🔄 Toggle Timer: {timer_status}", callback_data="toggle_schedule_timer")],
-            [InlineKeyboardButton("🕐 Set Hour +", callback_data="hour_plus"), InlineKeyboardButton("🕐 Set Hour -", callback_data="hour_minus")],
-            [InlineKeyboardButton("🕕 Set Minute +", callback_data="minute_plus"), InlineKeyboardButton("🕕 Set Minute -", callback_data="minute_minus")],
-            [InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        try:
-            await query.edit_message_text(
-                f"⏰ <b>Schedule Timer Settings</b>\n\nCurrent Time: <code>{timer_time}</code>\nStatus: {timer_status}\n\nThis timer controls when auto-posting is active.",
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception:
-            try:
-                await query.edit_message_caption(
-                    caption=f"⏰ <b>Schedule Timer Settings</b>\n\nCurrent Time: <code>{timer_time}</code>\nStatus: {timer_status}\n\nThis timer controls when auto-posting is active.",
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            except Exception:
-                pass
+    logging.info(f"URLs found: {urls}")
     
-    elif data in ["hour_plus", "hour_minus", "minute_plus", "minute_minus"] and is_admin(user_id):
-        timer_settings = db.get_schedule_timer()
-        hours = timer_settings["hours"]
-        minutes = timer_settings["minutes"]
-        
-        if data == "hour_plus":
-            hours = (hours + 1) % 24
-        elif data == "hour_minus":
-            hours = (hours - 1) % 24
-        elif data == "minute_plus":
-            minutes = (minutes + 15) % 60
-        elif data == "minute_minus":
-            minutes = (minutes - 15) % 60
-            
-        success, message = db.set_schedule_timer(hours, minutes)
-        await query.answer(f"✅ {message}" if success else f"❌ {message}")
-        # Refresh schedule menu
-        timer_settings = db.get_schedule_timer()
-        timer_status = "🟢 ON" if timer_settings["enabled"] else "🔴 OFF"
-        timer_time = f"{timer_settings['hours']:02d}:{timer_settings['minutes']:02d}"
+    if urls:
+        # Auto-format with movie/content template
+        logging.info("Applying movie format")
+        formatted_message = format_movie_links(message_text, urls)
+        logging.info(f"Formatted message: {formatted_message}")
+    else:
+        # Try to extract title, price, link, description from "Key: value" lines
+        extracted_data = extract_fields(message_text)
         
-        keyboard = [
-            [InlineKeyboardButton(f"🔄 Toggle Timer: {timer_status}", callback_data="toggle_schedule_timer")],
-            [InlineKeyboardButton("🕐 Set Hour +", callback_data="hour_plus"), InlineKeyboardButton("🕐 Set Hour -", callback_data="hour_minus")],
-            [InlineKeyboardButton("🕕 Set Minute +", callback_data="minute_plus"), InlineKeyboardButton("🕕 Set Minute -", callback_data="minute_minus")],
-            [InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Apply the current format; it is compiled once per version, so this is just a join
+        format_text, format_version = await async_db.get_format_with_version()
         
         try:
-            await query.edit_message_text(
-                f"⏰ <b>Schedule Timer Settings</b>\n\nCurrent Time: <code>{timer_time}</code>\nStatus: {timer_status}\n\nThis timer controls when auto-posting is active.",
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception:
-            try:
-                await query.edit_message_caption(
-                    caption=f"⏰ <b>Schedule Timer Settings</b>\n\nCurrent Time: <code>{timer_time}</code>\nStatus: {timer_status}\n\nThis timer controls when auto-posting is active.",
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            except Exception:
-                pass
+            formatted_message = template_cache.get(format_text, format_version).render(extracted_data)
+        except TemplateError as e:
+            # Formats stored before validation existed may not compile - use original message
+            logging.error(f"Stored format is invalid: {e}")
+            formatted_message = message_text
+    return formatted_message
+
+async def queue_post(message, payload, channels):
+    """Record the broadcast as a durable job; the post queue worker delivers it and reports back"""
+    job_id = await post_queue.enqueue(payload, channels, message.chat_id, message.message_id, message.date)
+    if not job_id:
+        await message.reply_text("❌ Could not queue the post for broadcasting. Please try again.")
+        return
     
-    elif data == "back_to_main":
-        # Edit back to welcome message
-        user_name = query.from_user.first_name or "User"
-        start_message = db.get_start_message().format(user_name)
-        
-        keyboard = []
-        if is_admin(query.from_user.id):
-            keyboard = [
-                [InlineKeyboardButton("Manage Channels", callback_data="manage_channels"), InlineKeyboardButton("Help", callback_data="help")]
-            ]
-        else:
-            keyboard = [
-                [InlineKeyboardButton("Help", callback_data="help")]
-            ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+    window = ScheduleWindow.from_settings(await async_db.get_schedule_timer())
+    if not window.is_open():
+        opens_at = window.next_open().strftime('%H:%M')
+        await message.reply_text(f"⏰ Schedule timer is on. This post will be published when the posting window opens at {opens_at} ({SCHEDULE_TIMEZONE}).")
+
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle button callbacks"""
+    query = update.callback_query
+    if not query or not query.from_user:
+        return
+    await callback_router.dispatch(query, context, is_admin)
+
+async def edit_menu(query, text, reply_markup):
+    """Show a menu screen in the message the button belongs to, with one edit call at most"""
+    message = query.message
+    key = (message.chat.id, message.message_id) if message else None
+    entry = edit_memo.get(key) if key else None
+    if entry is not None:
+        is_photo = entry[0]
+        if entry[1] == text and entry[2] == reply_markup:
+            return
+    else:
+        # Messages older than 48 hours come back without their content; assume the photo start menu
+        is_photo = bool(getattr(message, "photo", True))
+
+    for attempt in range(2):
         try:
-            await query.edit_message_caption(
-                caption=start_message,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        except Exception:
-            await query.edit_message_text(
-                start_message,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
+            if is_photo:
+                await query.edit_message_caption(caption=text, parse_mode='HTML', reply_markup=reply_markup)
+            else:
+                await query.edit_message_text(text, parse_mode='HTML', reply_markup=reply_markup)
+            break
+        except BadRequest as e:
+            reason = e.message.lower()
+            if "not modified" in reason:
+                break
+            if attempt == 0 and ("no caption" in reason or "no text" in reason):
+                # Guessed the kind wrong; the other edit method is the right one
+                is_photo = not is_photo
+                continue
+            logging.warning(f"Failed to update menu: {e}")
+            return
+        except Exception as e:
+            logging.warning(f"Failed to update menu: {e}")
+            return
+    if key:
+        edit_memo.set(key, is_photo, text, reply_markup)
+
+# Callback routes. Screens are built from cached reads, except that after a toggle the
+# toggled value is the one the write stored, so a stale cache or a double tap can't show
+# the opposite state.
+
+@callback_router.route(HELP, admin_only=False)
+async def help_callback(query, context, argument):
+    if query.message:
+        await query.message.reply_text(HELP_TEXT, parse_mode='HTML')
+
+@callback_router.route(MAIN_MENU, admin_only=False)
+async def main_menu_callback(query, context, argument):
+    start_message = (await async_db.get_start_message()).format(query.from_user.first_name or "User")
+    await edit_menu(query, start_message, main_menu_keyboard(is_admin(query.from_user.id)))
+
+@callback_router.route(SETTINGS)
+async def settings_callback(query, context, argument):
+    await edit_menu(query, SETTINGS_TEXT, SETTINGS_KEYBOARD)
+
+@callback_router.route(MANAGE_CHANNELS)
+async def manage_channels_callback(query, context, argument):
+    await edit_menu(query, MANAGE_CHANNELS_TEXT, MANAGE_CHANNELS_KEYBOARD)
+
+@callback_router.route(ADD_CHANNEL)
+async def add_channel_callback(query, context, argument):
+    await edit_menu(query, ADD_CHANNEL_TEXT, BACK_TO_CHANNELS_KEYBOARD)
+
+@callback_router.route(REMOVE_CHANNEL)
+async def remove_channel_callback(query, context, argument):
+    await edit_menu(query, REMOVE_CHANNEL_TEXT, BACK_TO_CHANNELS_KEYBOARD)
+
+@callback_router.route(ALL_CHANNELS)
+async def all_channels_callback(query, context, argument):
+    channels = await async_db.get_all_channels_with_status()
+    await edit_menu(query, *channels_menu(channels_key(channels)))
+
+@callback_router.route(TOGGLE_CHANNEL)
+async def toggle_channel_callback(query, context, channel_id):
+    success, message, active = await async_db.toggle_channel(channel_id)
+    if not success:
+        return f"❌ {message}"
+    # The toggled channel shows the value the update stored, even if the list is read from a stale cache
+    channels = channels_key(await async_db.get_all_channels_with_status())
+    channels = tuple((c_id, name, active if c_id == channel_id else c_active) for c_id, name, c_active in channels)
+    await edit_menu(query, *channels_menu(channels))
+    return f"✅ {message}"
+
+@callback_router.route(TOGGLE_AUTO_FORWARD)
+async def toggle_auto_forward_callback(query, context, argument):
+    success, message, auto_forward = await async_db.toggle_auto_forward()
+    if not success:
+        return f"❌ {message}"
+    start_message = (await async_db.get_start_message()).format(query.from_user.first_name or "User")
+    timer = await async_db.get_schedule_timer()
+    await edit_menu(query, start_message, admin_menu_keyboard(auto_forward, timer["enabled"]))
+    return f"✅ {message}"
+
+@callback_router.route(SCHEDULE_MENU)
+async def schedule_menu_callback(query, context, argument):
+    await edit_menu(query, *schedule_menu(await async_db.get_schedule_timer()))
+
+@callback_router.route(TOGGLE_SCHEDULE)
+async def toggle_schedule_callback(query, context, argument):
+    success, message, timer = await async_db.toggle_schedule_timer()
+    if not success:
+        return f"❌ {message}"
+    post_queue.wake()
+    await edit_menu(query, *schedule_menu(timer))
+    return f"✅ {message}"
+
+@callback_router.route(ADJUST_SCHEDULE)
+async def adjust_schedule_callback(query, context, argument):
+    unit, _, amount = argument.partition(":")
+    if unit not in ("h", "m") or not amount.lstrip("-").isdigit():
+        return None
+    timer = await async_db.get_schedule_timer()
+    hours, minutes = timer["hours"], timer["minutes"]
+    if unit == "h":
+        hours = (hours + int(amount)) % 24
+    else:
+        minutes = (minutes + int(amount)) % 60
+
+    success, message = await async_db.set_schedule_timer(hours, minutes)
+    post_queue.wake()
+    if success:
+        # Setting the time also switches the timer on
+        timer = {"hours": hours, "minutes": minutes, "enabled": True}
+    await edit_menu(query, *schedule_menu(timer))
+    return f"✅ {message}" if success else f"❌ {message}"
 
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel current conversation"""
@@ -967,7 +531,7 @@ async def autoforward_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     if not context.args:
         # Show current status if no arguments
-        current_status = "ON" if db.get_auto_forward_status() else "OFF"
+        current_status = "ON" if await async_db.get_auto_forward_status() else "OFF"
         await update.message.reply_text(
             f"🚀 <b>Auto Forward Status:</b> {current_status}\n\n"
             "<b>Usage:</b>\n"
@@ -981,24 +545,24 @@ async def autoforward_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     if command_arg == "on":
         # Enable auto forward if it's currently disabled
-        current_status = db.get_auto_forward_status()
+        current_status = await async_db.get_auto_forward_status()
         if current_status:
             await update.message.reply_text("✅ Auto forward is already ON!")
         else:
-            success, message = db.toggle_auto_forward()
-            if success and "enabled" in message:
+            success, message, enabled = await async_db.toggle_auto_forward()
+            if success and enabled:
                 await update.message.reply_text("✅ Auto forward has been turned ON! 🚀")
             else:
                 await update.message.reply_text("❌ Failed to enable auto forward.")
     
     elif command_arg == "off":
         # Disable auto forward if it's currently enabled
-        current_status = db.get_auto_forward_status()
+        current_status = await async_db.get_auto_forward_status()
         if not current_status:
             await update.message.reply_text("✅ Auto forward is already OFF!")
         else:
-            success, message = db.toggle_auto_forward()
-            if success and "disabled" in message:
+            success, message, enabled = await async_db.toggle_auto_forward()
+            if success and not enabled:
                 await update.message.reply_text("✅ Auto forward has been turned OFF! ⏹️")
             else:
                 await update.message.reply_text("❌ Failed to disable auto forward.")
@@ -1023,12 +587,12 @@ async def forwardstatus_command(update: Update, context: ContextTypes.DEFAULT_TY
         return
     
     # Get current auto forward status
-    auto_forward_status = db.get_auto_forward_status()
+    auto_forward_status = await async_db.get_auto_forward_status()
     status_text = "🟢 ON" if auto_forward_status else "🔴 OFF"
     
     # Get channel count
-    active_channels = len(db.get_channels(active_only=True))
-    total_channels = len(db.get_channels(active_only=False))
+    active_channels = len(await async_db.get_channels(active_only=True))
+    total_channels = len(await async_db.get_channels(active_only=False))
     
     status_message = (
         f"📊 <b>Forwarding Status</b>\n\n"
@@ -0,0 +1,252 @@
+import asyncio
+import datetime
+import logging
+import random
+import time
+from telegram.error import BadRequest, ChatMigrated, Forbidden, InvalidToken, NetworkError, RetryAfter, TimedOut
+from database import async_db
+from metrics import send_errors, send_seconds
+from config import (
+    PER_CHAT_SEND_RATE, PER_CHAT_SEND_BURST, MAX_CONCURRENT_SENDS, SEND_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_JITTER, RETRY_AFTER_BUFFER
+)
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per `per` seconds, at most `capacity` at once"""
+
+    def __init__(self, rate, per=1.0, capacity=None):
+        self.fill_rate = rate / per
+        # Without an explicit capacity the burst follows the rate
+        self.fixed_capacity = capacity
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate, per=1.0):
+        """Change the fill rate; an unset capacity follows so bursts shrink with the rate"""
+        self._refill()
+        self.fill_rate = rate / per
+        if self.fixed_capacity is None:
+            self.capacity = max(1, rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+    def is_idle(self):
+        """True when the bucket is full, i.e. nobody has used it recently"""
+        self._refill()
+        return self.tokens >= self.capacity
+
+class SendResult:
+    """Outcome of delivering one post to one channel"""
+
+    __slots__ = ("channel_id", "success", "attempts", "latency", "error")
+
+    def __init__(self, channel_id, success, attempts, latency, error=None):
+        self.channel_id = channel_id
+        self.success = success
+        self.attempts = attempts
+        self.latency = latency
+        self.error = error
+
+def retry_after_seconds(error):
+    """Seconds Telegram asked us to wait in a RetryAfter error"""
+    value = error.retry_after
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return float(value)
+
+class RetryPolicy:
+    """Decides whether and when a failed Telegram send is retried, based on the error type"""
+
+    # Errors that won't go away by trying again (bot kicked, chat not found, bad caption, ...)
+    PERMANENT_ERRORS = (Forbidden, BadRequest, ChatMigrated, InvalidToken)
+
+    def __init__(self, max_attempts=SEND_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 jitter=RETRY_JITTER, retry_after_buffer=RETRY_AFTER_BUFFER):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_after_buffer = retry_after_buffer
+
+    def backoff(self, attempt):
+        """Exponential backoff with jitter for the given (1-based) attempt"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * (1 + random.uniform(0, self.jitter))
+
+    def delay(self, error, attempt):
+        """Seconds to wait before retrying after `error`, or None if it shouldn't be retried"""
+        if attempt >= self.max_attempts:
+            return None
+        if isinstance(error, RetryAfter):
+            return retry_after_seconds(error) + self.retry_after_buffer
+        # BadRequest subclasses NetworkError, so permanent errors are checked first
+        if isinstance(error, self.PERMANENT_ERRORS):
+            return None
+        # TimedOut, NetworkError and anything unexpected
+        return self.backoff(attempt)
+
+def describe_failure(error):
+    """Short human readable reason for a failed delivery"""
+    if isinstance(error, RetryAfter):
+        return "Rate limited - try again later"
+    if isinstance(error, Forbidden):
+        return "Bot was removed or can't post there"
+    if isinstance(error, ChatMigrated):
+        return f"Group moved to {error.new_chat_id}"
+    if isinstance(error, BadRequest):
+        return f"Invalid channel/permissions: {error.message}"
+    if isinstance(error, TimedOut):
+        return "Connection timeout"
+    if isinstance(error, NetworkError):
+        return "Network error"
+    return "Unknown error"
+
+def failure_reason(error):
+    """Short label for a failed attempt, used in metrics"""
+    if isinstance(error, RetryAfter):
+        return "flood"
+    if isinstance(error, Forbidden):
+        return "forbidden"
+    if isinstance(error, ChatMigrated):
+        return "migrated"
+    if isinstance(error, BadRequest):
+        return "bad_request"
+    if isinstance(error, TimedOut):
+        return "timeout"
+    if isinstance(error, NetworkError):
+        return "network"
+    return "other"
+
+class ChannelDispatcher:
+    """Sends posts to many channels concurrently under per-chat rate limits.
+
+    The global rate is enforced for every request by flood_control.FloodCoordinator,
+    which is installed as the application's rate limiter.
+    """
+
+    # Errors that mean nothing more can be posted to the channel, whatever the post
+    CHANNEL_ERRORS = (Forbidden, ChatMigrated, InvalidToken)
+
+    def __init__(self, per_chat_rate=PER_CHAT_SEND_RATE, per_chat_burst=PER_CHAT_SEND_BURST,
+                 max_concurrency=MAX_CONCURRENT_SENDS, retry_policy=None):
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_concurrency = max_concurrency
+        self._chat_buckets = {}
+
+    def _chat_bucket(self, channel_id):
+        bucket = self._chat_buckets.get(channel_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, per=60.0, capacity=self.per_chat_burst)
+            self._chat_buckets[channel_id] = bucket
+        return bucket
+
+    def _prune_buckets(self):
+        """Drop per-chat buckets that have fully refilled so the dict doesn't grow forever"""
+        for channel_id in [c for c, b in self._chat_buckets.items() if b.is_idle()]:
+            del self._chat_buckets[channel_id]
+
+    async def stream(self, streams, send):
+        """Deliver per-channel ordered streams, calling `send(channel_id, item)` for every item.
+
+        `streams` maps channel_id -> items. Each channel sends its items one after another,
+        so posts appear in the same order everywhere, while channels run side by side.
+        A send holds the shared semaphore only while its request is in flight, so with more
+        channels than max_concurrency the channels take turns instead of the first ones
+        draining their whole stream, and a channel waiting on its rate limit or a retry
+        doesn't hold a slot. Returns a list of (item, SendResult).
+        """
+        self._prune_buckets()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_channel(channel_id, items):
+            delivered = []
+            for position, item in enumerate(items):
+                result = await self._deliver(channel_id, lambda chat_id: send(chat_id, item), semaphore)
+                delivered.append((item, result))
+                if not result.success and isinstance(result.error, self.CHANNEL_ERRORS):
+                    # Don't spend the rate budget on a channel the bot can't post to
+                    delivered.extend(
+                        (rest, SendResult(channel_id, False, 0, 0.0, result.error)) for rest in items[position + 1:]
+                    )
+                    break
+            return delivered
+
+        streams_delivered = await asyncio.gather(
+            *(run_channel(channel_id, items) for channel_id, items in streams.items())
+        )
+        return [pair for delivered in streams_delivered for pair in delivered]
+
+    async def _deliver(self, channel_id, send, semaphore):
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            # Waiting for the chat's rate limit or a retry doesn't take a slot from other channels;
+            # the semaphore only bounds requests actually in flight
+            await self._chat_bucket(channel_id).acquire()
+            try:
+                async with semaphore:
+                    await send(channel_id)
+                latency = time.monotonic() - started
+                logging.info(f"Posted to channel {channel_id} on attempt {attempt} in {latency:.2f}s")
+                send_seconds.observe(latency, channel_id)
+                return SendResult(channel_id, True, attempt, latency)
+            except Exception as e:
+                send_errors.inc(channel_id, failure_reason(e))
+                delay = self.retry_policy.delay(e, attempt)
+                if delay is None:
+                    latency = time.monotonic() - started
+                    logging.error(f"Giving up on channel {channel_id} after {attempt} attempt(s) in {latency:.2f}s: {type(e).__name__}: {e}")
+                    return SendResult(channel_id, False, attempt, latency, e)
+                logging.warning(f"Attempt {attempt} failed for channel {channel_id} ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+async def send_photo_cached(send, photo, bot_id, **kwargs):
+    """Send a photo with `send`, reusing the Telegram file_id of URLs that were sent before"""
+    if not photo.startswith(('http://', 'https://')):
+        return await send(photo=photo, **kwargs)
+
+    file_id = await async_db.get_file_id(photo, bot_id)
+    if file_id:
+        try:
+            return await send(photo=file_id, **kwargs)
+        except BadRequest as e:
+            if "file" not in str(e).lower():
+                raise
+            # Stale or foreign file_id - fall back to the URL and refresh the cache
+            logging.warning(f"Cached file_id for {photo} was rejected: {e}")
+            await async_db.forget_file_id(photo, bot_id)
+
+    message = await send(photo=photo, **kwargs)
+    if message and message.photo:
+        await async_db.set_file_id(photo, bot_id, message.photo[-1].file_id)
+    return message
+
+def summarize_latency(results):
+    """Return (average, slowest) latency in seconds for a list of SendResult, ignoring skipped deliveries"""
+    latencies = [r.latency for r in results if r.attempts]
+    if not latencies:
+        return 0.0, 0.0
+    return sum(latencies) / len(latencies), max(latencies)
+
+# Global dispatcher instance shared by all handlers so rate limits apply across posts
+dispatcher = ChannelDispatcher()
@@ -1,3 +1,4 @@
+import hashlib
 import os
 
 # Bot configuration - Direct credentials for reliable operation
@@ -17,14 +18,107 @@ WELCOME_IMAGES = [
     "https://i.postimg.cc/CxpgtZY7/Whats-App-Image-2025-08-25-at-22-44-03-41c55cf3.jpg"
 ]
 
+# Image attached to text-only posts
+DEFAULT_POST_IMAGE = "https://files.catbox.moe/9i18yn.jpg"
+
 DEFAULT_FORMAT = """
 📌 **{title}**
 💰 Price: {price}
 🔗 Link: {link}
 """
 
+# Extra "Key: value" labels understood in non-link posts, e.g. "naam=title,daam=price"
+FIELD_KEY_ALIASES = os.getenv("FIELD_KEY_ALIASES", "")
+
+# How long to wait for the rest of an album after its latest item arrived
+ALBUM_COLLECT_SECONDS = float(os.getenv("ALBUM_COLLECT_SECONDS", "1.5"))
+
 # Database collections
 DB_NAME = "telegram_bot"
 CHANNELS_COLLECTION = "channels"
 FORMATS_COLLECTION = "formats"
 SETTINGS_COLLECTION = "settings"
+MEDIA_CACHE_COLLECTION = "media_cache"
+BROADCAST_JOBS_COLLECTION = "broadcast_jobs"
+
+# Broadcast rate limits (Telegram allows ~30 msg/s overall and ~20 msg/min per group)
+GLOBAL_SEND_RATE = float(os.getenv("GLOBAL_SEND_RATE", "30"))  # messages per second, upper bound for the adaptive rate
+# Requests the global limiter lets through at once; Telegram counts a burst on top of the
+# steady rate against the 30/s limit, so keep this small
+GLOBAL_SEND_BURST = int(os.getenv("GLOBAL_SEND_BURST", "1"))
+PER_CHAT_SEND_RATE = float(os.getenv("PER_CHAT_SEND_RATE", "20"))  # messages per minute
+PER_CHAT_SEND_BURST = int(os.getenv("PER_CHAT_SEND_BURST", "3"))
+MAX_CONCURRENT_SENDS = int(os.getenv("MAX_CONCURRENT_SENDS", "25"))
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "3"))  # tries per channel, including the first
+
+# Storage backend: "mongo" (MONGO_URI), "sqlite" (a local file in WAL mode) or "memory" (nothing persisted)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "bot.db")
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))  # seconds to wait for another writer
+
+# Thread pool size for running blocking database calls off the event loop
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+
+# MongoClient connection pool and timeouts (milliseconds)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")  # zstd/snappy need extra packages
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred")
+
+# Background ping: the database is marked degraded after a failed ping or when RTT is above the threshold,
+# and queries then time out after MONGO_DEGRADED_TIMEOUT instead of waiting for server selection
+MONGO_PING_INTERVAL = float(os.getenv("MONGO_PING_INTERVAL", "15"))
+MONGO_DEGRADED_RTT_MS = float(os.getenv("MONGO_DEGRADED_RTT_MS", "1000"))
+MONGO_DEGRADED_TIMEOUT = float(os.getenv("MONGO_DEGRADED_TIMEOUT", "1.5"))
+
+# Config cache: TTL used when no change stream is available, and a longer safety TTL while one is
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_STREAM_TTL_SECONDS = float(os.getenv("CACHE_STREAM_TTL_SECONDS", "600"))
+CACHE_CHANGE_STREAM = os.getenv("CACHE_CHANGE_STREAM", "true").lower() == "true"
+
+# Webhook mode: set WEBHOOK_URL (public https base URL) to receive updates via webhook instead of polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Telegram echoes this back in X-Telegram-Bot-Api-Secret-Token; derived from the token unless set
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or hashlib.sha256(BOT_TOKEN.encode()).hexdigest()
+PORT = int(os.getenv("PORT", "5000"))
+
+# /metrics: how often the event-loop lag probe wakes up
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+# Profiling: time every handler's steps on the event loop, log slow handlers, and log the loop
+# thread's stack whenever the loop is stuck for LOOP_STALL_SECONDS
+PROFILE_HANDLERS = os.getenv("PROFILE_HANDLERS", "false").lower() == "true"
+SLOW_HANDLER_SECONDS = float(os.getenv("SLOW_HANDLER_SECONDS", "2"))
+LOOP_STALL_SECONDS = float(os.getenv("LOOP_STALL_SECONDS", "0.5"))
+
+# Schedule timer: posts are published during a daily window starting at the configured time
+SCHEDULE_WINDOW_MINUTES = int(os.getenv("SCHEDULE_WINDOW_MINUTES", "60"))
+SCHEDULE_TIMEZONE = os.getenv("SCHEDULE_TIMEZONE", "UTC")
+
+# Bulk broadcasts: posts queued within BROADCAST_COLLECT_SECONDS of each other are sent as one
+# batch (up to BROADCAST_BATCH_MAX_JOBS posts) and reported with a single message
+BROADCAST_COLLECT_SECONDS = float(os.getenv("BROADCAST_COLLECT_SECONDS", "2"))
+BROADCAST_BATCH_MAX_JOBS = int(os.getenv("BROADCAST_BATCH_MAX_JOBS", "50"))
+
+# Staging channel (id or @username): when set, each post is sent there once and copied to the target
+# channels with copyMessage/copyMessages, up to COPY_BATCH_SIZE messages per call. Posts are staged before
+# the channels are served, so it pays off for long channel lists. The bot must be able to post there.
+STAGING_CHANNEL_ID = os.getenv("STAGING_CHANNEL_ID", "")
+COPY_BATCH_SIZE = 100  # Bot API limit for copyMessages
+
+# Retry policy for failed sends: exponential backoff with jitter, capped
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "60"))
+RETRY_JITTER = float(os.getenv("RETRY_JITTER", "0.5"))  # fraction of the delay added at random
+RETRY_AFTER_BUFFER = float(os.getenv("RETRY_AFTER_BUFFER", "1"))  # extra seconds on top of Telegram's retry_after
+
+# Adaptive flood control: halve the global rate on RetryAfter, creep back up after a run of clean requests
+FLOOD_MIN_RATE = float(os.getenv("FLOOD_MIN_RATE", "1"))
+FLOOD_BACKOFF_FACTOR = float(os.getenv("FLOOD_BACKOFF_FACTOR", "0.5"))
+FLOOD_RECOVERY_REQUESTS = int(os.getenv("FLOOD_RECOVERY_REQUESTS", "50"))
+FLOOD_RECOVERY_STEP = float(os.getenv("FLOOD_RECOVERY_STEP", "1"))
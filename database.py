@@ -1,23 +1,282 @@
-from pymongo import MongoClient
-from config import MONGO_URI, DB_NAME, CHANNELS_COLLECTION, FORMATS_COLLECTION, SETTINGS_COLLECTION, DEFAULT_FORMAT, DEFAULT_START_MESSAGE, WELCOME_IMAGES
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient, ReturnDocument, timeout as operation_timeout
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+from config import (
+    MONGO_URI, DB_NAME, CHANNELS_COLLECTION, FORMATS_COLLECTION, SETTINGS_COLLECTION, MEDIA_CACHE_COLLECTION, BROADCAST_JOBS_COLLECTION, DEFAULT_FORMAT, DEFAULT_START_MESSAGE, WELCOME_IMAGES,
+    DB_EXECUTOR_WORKERS, CACHE_TTL_SECONDS, CACHE_STREAM_TTL_SECONDS, CACHE_CHANGE_STREAM,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_COMPRESSORS, MONGO_READ_PREFERENCE,
+    MONGO_PING_INTERVAL, MONGO_DEGRADED_RTT_MS, MONGO_DEGRADED_TIMEOUT, STORAGE_BACKEND, SQLITE_PATH
+)
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+import asyncio
+import datetime
+import functools
+import inspect
 import logging
+import time
+from templates import TemplateError, compile_template
+from metrics import db_query_seconds
+
+CACHED_COLLECTIONS = (CHANNELS_COLLECTION, FORMATS_COLLECTION, SETTINGS_COLLECTION, MEDIA_CACHE_COLLECTION)
+
+# Attributes set up by Database.connect(); touching one before that connects first
+CONNECTION_ATTRIBUTES = frozenset({"client", "db", "channels", "formats", "settings", "media_cache", "broadcast_jobs"})
+
+def _copy_value(value):
+    """Shallow copy cached lists/dicts so callers can't mutate the cache"""
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+def cached_read(collection, fallback):
+    """Read-through cache for a Database read method.
+
+    Results are cached per collection and argument set until a write to that
+    collection invalidates them. Errors are logged and `fallback` is returned
+    without being cached.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def cache_key(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            return (func.__name__,) + tuple(bound.arguments.values())[1:]
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = cache_key(self, *args, **kwargs)
+            hit, value = self._cache_get(collection, key)
+            if hit:
+                return value
+            generation = self._cache_generation(collection)
+            try:
+                value = func(self, *args, **kwargs)
+            except Exception as e:
+                logging.error(f"Error in {func.__name__}: {e}")
+                return _copy_value(fallback)
+            self._cache_put(collection, key, value, generation)
+            return _copy_value(value)
+
+        wrapper.cache_collection = collection
+        wrapper.cache_key = cache_key
+        return wrapper
+    return decorator
+
+class Storage:
+    """Backend-independent part of the bot's storage: lazy connection, read cache and health.
+
+    Backends implement _connect() and the data methods. Database is the MongoDB
+    backend; sqlite_database has the SQLite and in-memory ones. Creating an
+    instance is free; the connection is made by connect(), which main starts in
+    the background, or on first use.
+    """
+
+    backend = None
 
-class Database:
     def __init__(self):
+        # collection name -> {key: (expires_at, value)}
+        self._cache = {name: {} for name in CACHED_COLLECTIONS}
+        self._generations = {name: 0 for name in CACHED_COLLECTIONS}
+        self._cache_ttl = CACHE_TTL_SECONDS
+        self._connect_lock = Lock()
+        self.connected = False
+        self.connect_seconds = None
+        # Only remote backends measure these
+        self.degraded = False
+        self.rtt_ms = None
+        self.last_ping_at = None
+        self.ping_failures = 0
+
+    def connect(self):
+        """Connect and prepare defaults and indexes; later calls return immediately"""
+        with self._connect_lock:
+            if self.connected:
+                return
+            started = time.monotonic()
+            self._connect()
+            self.connect_seconds = time.monotonic() - started
+            self.connected = True
+            logging.info(f"Database ({self.backend}) connected successfully in {self.connect_seconds:.2f}s")
+        self._start_background_tasks()
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _start_background_tasks(self):
+        pass
+
+    def connect_in_background(self):
+        """Start connect() on a thread so it overlaps with the rest of startup"""
+        thread = Thread(target=self._connect_quietly, name="db-connect", daemon=True)
+        thread.start()
+        return thread
+
+    def _connect_quietly(self):
         try:
-            self.client = MongoClient(MONGO_URI)
+            self.connect()
+        except Exception:
+            # Already logged; the next database call retries the connection
+            pass
+
+    def guarded(self, func, *args, **kwargs):
+        """Call a database method; remote backends use this to fail fast while degraded"""
+        return func(*args, **kwargs)
+
+    def health(self):
+        """Connection state for the health endpoint"""
+        return {
+            "backend": self.backend,
+            "connected": self.connected,
+            "degraded": self.degraded,
+            "rtt_ms": round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+            "last_ping_at": self.last_ping_at,
+            "ping_failures": self.ping_failures,
+            "connect_seconds": round(self.connect_seconds, 3) if self.connect_seconds is not None else None,
+        }
+
+    def _cache_get(self, collection, key):
+        entry = self._cache[collection].get(key)
+        if entry and entry[0] > time.monotonic():
+            return True, _copy_value(entry[1])
+        return False, None
+
+    def _cache_generation(self, collection):
+        return self._generations[collection]
+
+    def _cache_put(self, collection, key, value, generation):
+        # Skip the store if a write invalidated the collection while we were reading
+        if self._generations[collection] == generation:
+            self._cache[collection][key] = (time.monotonic() + self._cache_ttl, value)
+
+    def invalidate(self, collection=None):
+        """Drop cached reads for one collection, or for all of them"""
+        for name in ([collection] if collection else CACHED_COLLECTIONS):
+            self._generations[name] += 1
+            self._cache[name] = {}
+
+    def cached(self, method_name, *args, **kwargs):
+        """Return (hit, value) for a cached read without touching the backend"""
+        method = getattr(type(self), method_name, None)
+        collection = getattr(method, "cache_collection", None)
+        if collection is None:
+            return False, None
+        try:
+            key = method.cache_key(self, *args, **kwargs)
+        except TypeError:
+            return False, None
+        return self._cache_get(collection, key)
+
+class Database(Storage):
+    """MongoDB storage backend"""
+
+    backend = "mongo"
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't set yet
+        if name in CONNECTION_ATTRIBUTES:
+            self.connect()
+            return object.__getattribute__(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def _connect(self):
+        try:
+            self.client = MongoClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                compressors=MONGO_COMPRESSORS,
+                readPreference=MONGO_READ_PREFERENCE
+            )
             self.db = self.client[DB_NAME]
             self.channels = self.db[CHANNELS_COLLECTION]
             self.formats = self.db[FORMATS_COLLECTION]
             self.settings = self.db[SETTINGS_COLLECTION]
+            self.media_cache = self.db[MEDIA_CACHE_COLLECTION]
+            self.broadcast_jobs = self.db[BROADCAST_JOBS_COLLECTION]
             
             # Initialize default values if they don't exist
             self.initialize_defaults()
-            logging.info("Database connected successfully")
+            self.ensure_indexes()
         except Exception as e:
             logging.error(f"Database connection failed: {e}")
             raise
 
+    def _start_background_tasks(self):
+        Thread(target=self._ping_loop, name="db-ping", daemon=True).start()
+        if CACHE_CHANGE_STREAM:
+            Thread(target=self._watch_changes, name="db-change-stream", daemon=True).start()
+
+    def ping(self):
+        """Measure the round-trip time to MongoDB and update the degraded flag; returns RTT in ms or None"""
+        started = time.monotonic()
+        try:
+            self.client.admin.command("ping")
+        except PyMongoError as e:
+            self.ping_failures += 1
+            self._set_degraded(True, f"ping failed: {e}")
+            return None
+        finally:
+            self.last_ping_at = time.time()
+        self.rtt_ms = (time.monotonic() - started) * 1000
+        self.ping_failures = 0
+        self._set_degraded(self.rtt_ms > MONGO_DEGRADED_RTT_MS, f"ping took {self.rtt_ms:.0f}ms")
+        return self.rtt_ms
+
+    def _set_degraded(self, degraded, reason):
+        if degraded and not self.degraded:
+            logging.warning(f"Database degraded ({reason}), queries now time out after {MONGO_DEGRADED_TIMEOUT}s")
+        elif self.degraded and not degraded:
+            logging.info(f"Database recovered ({reason})")
+        self.degraded = degraded
+
+    def _ping_loop(self):
+        while True:
+            self.ping()
+            time.sleep(MONGO_PING_INTERVAL)
+
+    def guarded(self, func, *args, **kwargs):
+        """Call a database method, failing fast with a short operation timeout while the database is degraded"""
+        if not self.degraded:
+            return func(*args, **kwargs)
+        with operation_timeout(MONGO_DEGRADED_TIMEOUT):
+            return func(*args, **kwargs)
+
+    def _watch_changes(self):
+        """Follow a change stream so writes from other bot replicas invalidate our cache"""
+        pipeline = [{"$match": {"ns.coll": {"$in": list(CACHED_COLLECTIONS)}}}]
+        backoff = 1
+        while True:
+            try:
+                with self.db.watch(pipeline) as stream:
+                    # Writes are pushed to us now, so only keep a long safety TTL
+                    self._cache_ttl = CACHE_STREAM_TTL_SECONDS
+                    self.invalidate()
+                    logging.info("Cache following MongoDB change stream")
+                    backoff = 1
+                    for change in stream:
+                        self.invalidate(change["ns"]["coll"])
+            except OperationFailure as e:
+                # Standalone servers don't support change streams - fall back to TTL expiry
+                self._cache_ttl = CACHE_TTL_SECONDS
+                self.invalidate()
+                logging.info(f"Change streams unavailable, using {CACHE_TTL_SECONDS}s cache TTL: {e}")
+                return
+            except PyMongoError as e:
+                self._cache_ttl = CACHE_TTL_SECONDS
+                self.invalidate()
+                logging.warning(f"Change stream interrupted, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
     def initialize_defaults(self):
         """Initialize default format and settings if they don't exist"""
         try:
@@ -37,18 +296,46 @@ class Database:
         except Exception as e:
             logging.error(f"Error initializing defaults: {e}")
 
+    def ensure_indexes(self):
+        """Create the indexes the bot's queries rely on (no-op if they already exist)"""
+        indexes = [
+            (self.channels, [("channel_id", ASCENDING)], {"unique": True}),
+            # Channels added without a custom name have no channel_name, so only index real names
+            (self.channels, [("channel_name", ASCENDING)], {
+                "unique": True,
+                "partialFilterExpression": {"channel_name": {"$type": "string"}}
+            }),
+            (self.channels, [("active", ASCENDING)], {}),
+            # Settings and formats are upserted by type, so without these two concurrent upserts
+            # (e.g. a double-tapped toggle) can each insert a document
+            (self.settings, [("type", ASCENDING)], {"unique": True}),
+            (self.formats, [("type", ASCENDING)], {"unique": True}),
+            (self.media_cache, [("url", ASCENDING), ("bot_id", ASCENDING)], {"unique": True}),
+            (self.broadcast_jobs, [("status", ASCENDING), ("created_at", ASCENDING)], {}),
+        ]
+        for collection, keys, options in indexes:
+            try:
+                collection.create_index(keys, **options)
+            except Exception as e:
+                # e.g. existing duplicate channels - queries still work, just unindexed
+                logging.error(f"Error creating index {keys} on {collection.name}: {e}")
+
     def add_channel(self, channel_id):
         """Add a channel to the database"""
         try:
             # Check if channel already exists
-            if self.channels.find_one({"channel_id": channel_id}):
+            if self.channels.find_one({"channel_id": channel_id}, {"_id": 1}):
                 return False, "Channel already exists"
             
             self.channels.insert_one({
                 "channel_id": channel_id,
                 "active": True
             })
+            self.invalidate(CHANNELS_COLLECTION)
             return True, "Channel added successfully"
+        except DuplicateKeyError:
+            # Lost a race with a concurrent add; the unique index caught it
+            return False, "Channel already exists"
         except Exception as e:
             logging.error(f"Error adding channel: {e}")
             return False, f"Error: {e}"
@@ -57,7 +344,7 @@ class Database:
         """Add a channel with custom name to the database"""
         try:
             # Check if channel already exists by ID or name
-            if self.channels.find_one({"$or": [{"channel_id": channel_id}, {"channel_name": channel_name}]}):
+            if self.channels.find_one({"$or": [{"channel_id": channel_id}, {"channel_name": channel_name}]}, {"_id": 1}):
                 return False, "Channel with this ID or name already exists"
             
             self.channels.insert_one({
@@ -65,7 +352,10 @@ class Database:
                 "channel_name": channel_name,
                 "active": True
             })
+            self.invalidate(CHANNELS_COLLECTION)
             return True, f"Channel '{channel_name}' added successfully"
+        except DuplicateKeyError:
+            return False, "Channel with this ID or name already exists"
         except Exception as e:
             logging.error(f"Error adding channel with name: {e}")
             return False, f"Error: {e}"
@@ -74,6 +364,7 @@ class Database:
         """Remove a channel from the database"""
         try:
             result = self.channels.delete_one({"channel_id": channel_id})
+            self.invalidate(CHANNELS_COLLECTION)
             if result.deleted_count > 0:
                 return True, "Channel removed successfully"
             else:
@@ -86,6 +377,7 @@ class Database:
         """Remove a channel by its display name"""
         try:
             result = self.channels.delete_one({"channel_name": channel_name})
+            self.invalidate(CHANNELS_COLLECTION)
             if result.deleted_count > 0:
                 return True, f"Channel '{channel_name}' removed successfully"
             else:
@@ -94,90 +386,102 @@ class Database:
             logging.error(f"Error removing channel by name: {e}")
             return False, f"Error: {e}"
 
+    @cached_read(CHANNELS_COLLECTION, fallback=[])
     def get_channels(self, active_only=True):
         """Get all channels from the database"""
-        try:
-            query = {"active": True} if active_only else {}
-            channels = list(self.channels.find(query))
-            # Return actual channel IDs for posting messages
-            return [channel["channel_id"] for channel in channels]
-        except Exception as e:
-            logging.error(f"Error getting channels: {e}")
-            return []
+        query = {"active": True} if active_only else {}
+        cursor = self.channels.find(query, {"_id": 0, "channel_id": 1})
+        # Return actual channel IDs for posting messages
+        return [channel["channel_id"] for channel in cursor]
     
+    @cached_read(CHANNELS_COLLECTION, fallback=[])
     def get_channels_display(self, active_only=True):
         """Get channels with display names for UI"""
-        try:
-            query = {"active": True} if active_only else {}
-            channels = list(self.channels.find(query))
-            # Return display names for UI
-            return [channel.get("channel_name", channel["channel_id"]) for channel in channels]
-        except Exception as e:
-            logging.error(f"Error getting channels display: {e}")
-            return []
+        query = {"active": True} if active_only else {}
+        cursor = self.channels.find(query, {"_id": 0, "channel_id": 1, "channel_name": 1})
+        # Return display names for UI
+        return [channel.get("channel_name", channel["channel_id"]) for channel in cursor]
 
+    @cached_read(CHANNELS_COLLECTION, fallback=[])
     def get_all_channels_with_status(self):
         """Get all channels with their active status"""
-        try:
-            channels = list(self.channels.find({}))
-            result = []
-            for channel in channels:
-                # Use channel_name if available, otherwise use channel_id
-                display_name = channel.get("channel_name", channel["channel_id"])
-                result.append({
-                    "channel_id": channel["channel_id"],
-                    "channel_name": display_name,
-                    "active": channel.get("active", True)
-                })
-            return result
-        except Exception as e:
-            logging.error(f"Error getting channels with status: {e}")
-            return []
+        cursor = self.channels.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1, "active": 1})
+        result = []
+        for channel in cursor:
+            # Use channel_name if available, otherwise use channel_id
+            display_name = channel.get("channel_name", channel["channel_id"])
+            result.append({
+                "channel_id": channel["channel_id"],
+                "channel_name": display_name,
+                "active": channel.get("active", True)
+            })
+        return result
+
+    def _toggle(self, collection, query, field, default, upsert=False, projection=None):
+        """Flip a boolean field in one server-side update and return the updated document.
+
+        The update is a pipeline so the new value is computed from the stored one,
+        which keeps concurrent toggles from reading the same old value.
+        """
+        return collection.find_one_and_update(
+            query,
+            [{"$set": {field: {"$not": [{"$ifNull": [f"${field}", default]}]}}}],
+            projection=projection or {"_id": 0, field: 1},
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER
+        )
 
     def toggle_channel(self, channel_id):
-        """Toggle channel active status"""
+        """Toggle channel active status; returns (success, message, new active status)"""
         try:
-            channel = self.channels.find_one({"channel_id": channel_id})
-            if not channel:
-                return False, "Channel not found"
-            
-            new_status = not channel.get("active", True)
-            self.channels.update_one(
-                {"channel_id": channel_id},
-                {"$set": {"active": new_status}}
+            channel = self._toggle(
+                self.channels, {"channel_id": channel_id}, "active", True,
+                projection={"_id": 0, "active": 1, "channel_name": 1}
             )
+            if not channel:
+                return False, "Channel not found", None
+            self.invalidate(CHANNELS_COLLECTION)
             
             # Use display name if available
             display_name = channel.get("channel_name", channel_id)
-            status_text = "activated" if new_status else "deactivated"
-            return True, f"'{display_name}' {status_text} successfully"
+            status_text = "activated" if channel["active"] else "deactivated"
+            return True, f"'{display_name}' {status_text} successfully", channel["active"]
         except Exception as e:
             logging.error(f"Error toggling channel: {e}")
-            return False, f"Error: {e}"
+            return False, f"Error: {e}", None
 
     def set_format(self, format_text):
-        """Set the current format"""
+        """Validate and set the current format; its version is bumped so compiled copies are refreshed"""
         try:
+            compile_template(format_text)
             self.formats.update_one(
                 {"type": "current_format"},
-                {"$set": {"format": format_text}},
+                {"$set": {"format": format_text}, "$inc": {"version": 1}},
                 upsert=True
             )
+            self.invalidate(FORMATS_COLLECTION)
             return True, "Format updated successfully"
+        except TemplateError as e:
+            return False, f"Invalid format: {e}"
         except Exception as e:
             logging.error(f"Error setting format: {e}")
             return False, f"Error: {e}"
 
+    @cached_read(FORMATS_COLLECTION, fallback=DEFAULT_FORMAT)
     def get_format(self):
         """Get the current format"""
-        try:
-            format_doc = self.formats.find_one({"type": "current_format"})
-            if format_doc:
-                return format_doc["format"]
-            return DEFAULT_FORMAT
-        except Exception as e:
-            logging.error(f"Error getting format: {e}")
-            return DEFAULT_FORMAT
+        format_doc = self.formats.find_one({"type": "current_format"})
+        if format_doc:
+            return format_doc["format"]
+        return DEFAULT_FORMAT
+
+    @cached_read(FORMATS_COLLECTION, fallback=(DEFAULT_FORMAT, 0))
+    def get_format_with_version(self):
+        """Get the current format and its version, which changes on every set_format"""
+        format_doc = self.formats.find_one({"type": "current_format"}, {"_id": 0, "format": 1, "version": 1})
+        if format_doc:
+            return format_doc["format"], format_doc.get("version", 0)
+        return DEFAULT_FORMAT, 0
 
     def set_start_message(self, message):
         """Set the start message"""
@@ -187,50 +491,38 @@ class Database:
                 {"$set": {"message": message}},
                 upsert=True
             )
+            self.invalidate(SETTINGS_COLLECTION)
             return True, "Start message updated successfully"
         except Exception as e:
             logging.error(f"Error setting start message: {e}")
             return False, f"Error: {e}"
 
+    @cached_read(SETTINGS_COLLECTION, fallback=DEFAULT_START_MESSAGE)
     def get_start_message(self):
         """Get the start message"""
-        try:
-            setting_doc = self.settings.find_one({"type": "start_message"})
-            if setting_doc:
-                return setting_doc["message"]
-            return DEFAULT_START_MESSAGE
-        except Exception as e:
-            logging.error(f"Error getting start message: {e}")
-            return DEFAULT_START_MESSAGE
+        setting_doc = self.settings.find_one({"type": "start_message"})
+        if setting_doc:
+            return setting_doc["message"]
+        return DEFAULT_START_MESSAGE
 
     def toggle_auto_forward(self):
-        """Toggle auto forward setting"""
+        """Toggle auto forward setting; returns (success, message, new status)"""
         try:
-            setting_doc = self.settings.find_one({"type": "auto_forward"})
-            current_status = setting_doc["enabled"] if setting_doc else True
-            new_status = not current_status
-            
-            self.settings.update_one(
-                {"type": "auto_forward"},
-                {"$set": {"enabled": new_status}},
-                upsert=True
-            )
-            status_text = "enabled" if new_status else "disabled"
-            return True, f"Auto forward {status_text}"
+            setting_doc = self._toggle(self.settings, {"type": "auto_forward"}, "enabled", True, upsert=True)
+            self.invalidate(SETTINGS_COLLECTION)
+            status_text = "enabled" if setting_doc["enabled"] else "disabled"
+            return True, f"Auto forward {status_text}", setting_doc["enabled"]
         except Exception as e:
             logging.error(f"Error toggling auto forward: {e}")
-            return False, f"Error: {e}"
+            return False, f"Error: {e}", None
 
+    @cached_read(SETTINGS_COLLECTION, fallback=True)
     def get_auto_forward_status(self):
         """Get auto forward status"""
-        try:
-            setting_doc = self.settings.find_one({"type": "auto_forward"})
-            if setting_doc:
-                return setting_doc.get("enabled", True)
-            return True  # Default enabled
-        except Exception as e:
-            logging.error(f"Error getting auto forward status: {e}")
-            return True
+        setting_doc = self.settings.find_one({"type": "auto_forward"})
+        if setting_doc:
+            return setting_doc.get("enabled", True)
+        return True  # Default enabled
 
     def set_schedule_timer(self, hours, minutes):
         """Set schedule timer"""
@@ -240,43 +532,206 @@ class Database:
                 {"$set": {"hours": hours, "minutes": minutes, "enabled": True}},
                 upsert=True
             )
+            self.invalidate(SETTINGS_COLLECTION)
             return True, f"Schedule timer set for {hours:02d}:{minutes:02d}"
         except Exception as e:
             logging.error(f"Error setting schedule timer: {e}")
             return False, f"Error: {e}"
 
+    @cached_read(SETTINGS_COLLECTION, fallback={"hours": 0, "minutes": 0, "enabled": False})
     def get_schedule_timer(self):
         """Get schedule timer settings"""
+        setting_doc = self.settings.find_one({"type": "schedule_timer"})
+        if setting_doc:
+            return {
+                "hours": setting_doc.get("hours", 0),
+                "minutes": setting_doc.get("minutes", 0),
+                "enabled": setting_doc.get("enabled", False)
+            }
+        return {"hours": 0, "minutes": 0, "enabled": False}
+
+    def toggle_schedule_timer(self):
+        """Toggle schedule timer enabled/disabled; returns (success, message, stored timer)"""
         try:
-            setting_doc = self.settings.find_one({"type": "schedule_timer"})
-            if setting_doc:
-                return {
-                    "hours": setting_doc.get("hours", 0),
-                    "minutes": setting_doc.get("minutes", 0),
-                    "enabled": setting_doc.get("enabled", False)
-                }
-            return {"hours": 0, "minutes": 0, "enabled": False}
+            setting_doc = self._toggle(
+                self.settings, {"type": "schedule_timer"}, "enabled", False, upsert=True,
+                projection={"_id": 0, "hours": 1, "minutes": 1, "enabled": 1}
+            )
+            self.invalidate(SETTINGS_COLLECTION)
+            status_text = "enabled" if setting_doc["enabled"] else "disabled"
+            timer = {"hours": setting_doc.get("hours", 0), "minutes": setting_doc.get("minutes", 0), "enabled": setting_doc["enabled"]}
+            return True, f"Schedule timer {status_text}", timer
         except Exception as e:
-            logging.error(f"Error getting schedule timer: {e}")
-            return {"hours": 0, "minutes": 0, "enabled": False}
+            logging.error(f"Error toggling schedule timer: {e}")
+            return False, f"Error: {e}", None
 
-    def toggle_schedule_timer(self):
-        """Toggle schedule timer enabled/disabled"""
+    @cached_read(MEDIA_CACHE_COLLECTION, fallback=None)
+    def get_file_id(self, url, bot_id):
+        """Get the Telegram file_id previously returned for a media URL"""
+        cache_doc = self.media_cache.find_one({"url": url, "bot_id": bot_id})
+        if cache_doc:
+            return cache_doc["file_id"]
+        return None
+
+    def set_file_id(self, url, bot_id, file_id):
+        """Remember the Telegram file_id for a media URL (file_ids are only valid for the bot that got them)"""
         try:
-            setting_doc = self.settings.find_one({"type": "schedule_timer"})
-            current_status = setting_doc["enabled"] if setting_doc else False
-            new_status = not current_status
-            
-            self.settings.update_one(
-                {"type": "schedule_timer"},
-                {"$set": {"enabled": new_status}},
+            self.media_cache.update_one(
+                {"url": url, "bot_id": bot_id},
+                {"$set": {"file_id": file_id}},
                 upsert=True
             )
-            status_text = "enabled" if new_status else "disabled"
-            return True, f"Schedule timer {status_text}"
+            self.invalidate(MEDIA_CACHE_COLLECTION)
+            return True, "File id cached"
         except Exception as e:
-            logging.error(f"Error toggling schedule timer: {e}")
+            logging.error(f"Error caching file id: {e}")
+            return False, f"Error: {e}"
+
+    def forget_file_id(self, url, bot_id):
+        """Drop a cached file_id that Telegram no longer accepts"""
+        try:
+            self.media_cache.delete_one({"url": url, "bot_id": bot_id})
+            self.invalidate(MEDIA_CACHE_COLLECTION)
+            return True, "File id removed"
+        except Exception as e:
+            logging.error(f"Error removing cached file id: {e}")
+            return False, f"Error: {e}"
+
+    def create_broadcast_job(self, payload, channels, reply_chat_id, source_message_id=None, posted_at=None):
+        """Record a post to deliver to `channels`; returns the job id or None"""
+        try:
+            result = self.broadcast_jobs.insert_one({
+                "status": "pending",
+                "created_at": datetime.datetime.now(datetime.timezone.utc),
+                "reply_chat_id": reply_chat_id,
+                # The admin's message, which orders posts the way they were sent
+                "source_message_id": source_message_id,
+                "posted_at": posted_at,
+                "payload": payload,
+                "deliveries": [
+                    {"channel_id": channel_id, "status": "pending", "attempts": 0}
+                    for channel_id in channels
+                ]
+            })
+            return str(result.inserted_id)
+        except Exception as e:
+            logging.error(f"Error creating broadcast job: {e}")
+            return None
+
+    def get_unfinished_jobs(self):
+        """Get broadcast jobs that still have work to do, oldest first"""
+        try:
+            jobs = list(self.broadcast_jobs.find({"status": {"$ne": "done"}}).sort("created_at", 1))
+            for job in jobs:
+                job["_id"] = str(job["_id"])
+            return jobs
+        except Exception as e:
+            logging.error(f"Error getting unfinished broadcast jobs: {e}")
+            return []
+
+    def update_delivery(self, job_id, index, **fields):
+        """Update the delivery state of one channel in a broadcast job"""
+        return self.update_deliveries(job_id, {index: fields})
+
+    def update_deliveries(self, job_id, updates):
+        """Update several deliveries of a broadcast job in one write; `updates` maps index -> fields"""
+        try:
+            self.broadcast_jobs.update_one(
+                {"_id": ObjectId(job_id)},
+                {"$set": {
+                    f"deliveries.{index}.{key}": value
+                    for index, fields in updates.items()
+                    for key, value in fields.items()
+                }}
+            )
+            return True, "Deliveries updated"
+        except Exception as e:
+            logging.error(f"Error updating deliveries: {e}")
             return False, f"Error: {e}"
 
-# Global database instance
-db = Database()
+    def finish_broadcast_job(self, job_id):
+        """Mark a broadcast job as fully processed"""
+        try:
+            self.broadcast_jobs.update_one(
+                {"_id": ObjectId(job_id)},
+                {"$set": {"status": "done", "finished_at": datetime.datetime.now(datetime.timezone.utc)}}
+            )
+            return True, "Broadcast job finished"
+        except Exception as e:
+            logging.error(f"Error finishing broadcast job: {e}")
+            return False, f"Error: {e}"
+
+    def recover_broadcast_jobs(self):
+        """After a restart, flag deliveries that were in flight when the process died.
+
+        We can't tell whether Telegram accepted those sends, so they are marked
+        "unknown" and reported instead of being posted a second time.
+        """
+        try:
+            result = self.broadcast_jobs.update_many(
+                {"status": {"$ne": "done"}, "deliveries.status": "sending"},
+                {"$set": {"deliveries.$[d].status": "unknown"}},
+                array_filters=[{"d.status": "sending"}]
+            )
+            return True, f"Recovered {result.modified_count} interrupted job(s)"
+        except Exception as e:
+            logging.error(f"Error recovering broadcast jobs: {e}")
+            return False, f"Error: {e}"
+
+class AsyncDatabase:
+    """Async facade over a storage backend with the same method surface.
+
+    Every call runs the blocking backend method in a bounded thread pool so a slow
+    Mongo round-trip or SQLite lock wait never freezes the bot's event loop. Reads
+    already in the read cache are returned directly.
+    """
+
+    def __init__(self, database, max_workers=DB_EXECUTOR_WORKERS):
+        self._db = database
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable in the database thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._timed, func, *args, **kwargs))
+
+    def _timed(self, func, *args, **kwargs):
+        # Measured on the worker thread, so time spent queued for a thread isn't counted
+        started = time.monotonic()
+        try:
+            return self._db.guarded(func, *args, **kwargs)
+        finally:
+            db_query_seconds.observe(time.monotonic() - started, func.__name__)
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            # Cached config reads are answered inline without a thread hop
+            hit, value = self._db.cached(name, *args, **kwargs)
+            if hit:
+                return value
+            return await self.run(attr, *args, **kwargs)
+
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, method)
+        return method
+
+def create_database(backend=STORAGE_BACKEND):
+    """Build the storage backend selected by STORAGE_BACKEND: mongo, sqlite or memory"""
+    if backend == "mongo":
+        return Database()
+    # Imported here because the SQLite backends build on Storage above
+    from sqlite_database import MemoryDatabase, SQLiteDatabase
+    if backend == "sqlite":
+        return SQLiteDatabase(SQLITE_PATH)
+    if backend == "memory":
+        return MemoryDatabase()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected mongo, sqlite or memory")
+
+# Global database instances; nothing connects until db.connect() or the first query
+db = create_database()
+async_db = AsyncDatabase(db)
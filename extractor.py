@@ -0,0 +1,147 @@
+import re
+from config import FIELD_KEY_ALIASES
+from formatting import URL_RE
+from templates import TEMPLATE_FIELDS
+
+# "Key: value" labels recognized in non-link posts (matched case-insensitively) and the field they fill
+DEFAULT_FIELD_KEYS = {
+    "title": "title",
+    "name": "title",
+    "product": "title",
+    "price": "price",
+    "offer price": "price",
+    "deal price": "price",
+    "cost": "price",
+    "mrp": "price",
+    "link": "link",
+    "url": "link",
+    "description": "description",
+    "desc": "description",
+    "details": "description",
+    "about": "description",
+}
+
+# Currency markers in prices, normalized to their symbol
+CURRENCY_SYMBOLS = {"rs": "₹", "inr": "₹", "₹": "₹", "usd": "$", "$": "$", "eur": "€", "€": "€", "gbp": "£", "£": "£"}
+PRICE_RE = re.compile(
+    r'(?i)(?:(?P<prefix>\b(?:rs|inr|usd|eur|gbp)\b\.?|[₹$€£])\s*)?'
+    r'(?P<amount>\d[\d,]*(?:\.\d+)?)'
+    r'(?:\s*/-)?'
+    r'(?:\s*(?P<suffix>\b(?:rs|inr|usd|eur|gbp)\b|[₹$€£]))?'
+)
+
+TITLE_FALLBACK_LENGTH = 100
+
+def parse_key_aliases(spec):
+    """Parse "alias=field,alias=field" into a key table; aliases for unknown fields are ignored"""
+    aliases = {}
+    for pair in spec.split(","):
+        alias, separator, field = pair.partition("=")
+        field = field.strip().lower()
+        if separator and alias.strip() and field in TEMPLATE_FIELDS:
+            aliases[" ".join(alias.lower().split())] = field
+    return aliases
+
+def normalize_price(value):
+    """Canonical form of a price: currency code/prefix as a symbol, "/-" dropped, e.g. "Rs. 1,299/-" -> "₹1,299"
+
+    Anything after the amount (e.g. "(was ₹1,999)") is kept; values without a number are returned as is.
+    """
+    match = PRICE_RE.search(value)
+    if not match:
+        return value.strip()
+    currency = match["prefix"] or match["suffix"]
+    symbol = CURRENCY_SYMBOLS[currency.lower().rstrip(".")] if currency else ""
+    return (value[:match.start()] + symbol + match["amount"] + value[match.end():]).strip()
+
+class FieldExtractor:
+    """Pulls title, price, link and description out of a "Key: value" post in one scan.
+
+    The key table is compiled into a single regex, so the text is scanned once
+    by the regex engine and only labelled lines reach Python.
+    Text after a description label runs until the next label, so descriptions
+    can span several lines.
+    """
+
+    def __init__(self, keys=None):
+        self.keys = dict(DEFAULT_FIELD_KEYS if keys is None else keys)
+        # Longest labels first so "offer price" wins over "price"
+        labels = sorted(self.keys, key=len, reverse=True)
+        alternation = "|".join(re.escape(label).replace(r"\ ", r"[ \t]+") for label in labels)
+        # A label may follow bullets/emoji at the start of a line and is separated by :, = or a dash
+        # followed by whitespace ("Price - 499"), so hyphenated words like "Price-drop" stay text.
+        # Lines are found by their leading newline rather than ^ with re.MULTILINE: a literal first
+        # character lets the regex engine jump between newlines instead of trying every position.
+        self.line_re = re.compile(
+            rf'\n[^\w\n]*(?P<key>{alternation})[ \t]*(?:[:：=]|[\-–](?=\s|$))[ \t]*(?P<value>[^\n]*)',
+            re.IGNORECASE
+        )
+
+    def extract(self, text):
+        """Return a dict with title, price, link and description (empty strings when missing)"""
+        fields = {"title": "", "price": "", "link": "", "description": ""}
+        unlabelled = []
+        description = None
+        # Offsets below are into `scan`, which starts with the newline the first line needs
+        scan = "\n" + text
+        position = 0
+        for match in self.line_re.finditer(scan):
+            between = scan[position:match.start()]
+            position = match.end()
+            if description is not None:
+                # Lines following a description label belong to it
+                description.append(between)
+            elif between.strip():
+                unlabelled.append(between)
+
+            field = self.keys[" ".join(match["key"].lower().split())]
+            value = match["value"].strip()
+            if field == "description":
+                description = [value]
+                continue
+            description_text = self._finish(description)
+            if description_text is not None:
+                fields["description"] = description_text
+            description = None
+            fields[field] = value
+
+        rest = scan[position:]
+        if description is not None:
+            description.append(rest)
+            fields["description"] = self._finish(description)
+        elif rest.strip():
+            unlabelled.append(rest)
+
+        labelled = position > 0
+        if not fields["description"]:
+            # Without an explicit description, use whatever wasn't labelled (the whole post if nothing was)
+            fields["description"] = "\n".join(part.strip() for part in unlabelled) if labelled else text
+
+        if fields["price"]:
+            fields["price"] = normalize_price(fields["price"])
+        if fields["link"]:
+            url = URL_RE.search(fields["link"])
+            if url:
+                fields["link"] = url.group()
+        else:
+            url = URL_RE.search(text)
+            if url:
+                fields["link"] = url.group()
+
+        # If no specific data found, use the message as title
+        if not fields["title"] and not fields["price"] and not fields["link"]:
+            fields["title"] = text[:TITLE_FALLBACK_LENGTH] + ('...' if len(text) > TITLE_FALLBACK_LENGTH else '')
+        return fields
+
+    @staticmethod
+    def _finish(parts):
+        if parts is None:
+            return None
+        return "".join(parts).strip()
+
+# Shared extractor using the default labels plus any configured in FIELD_KEY_ALIASES
+field_extractor = FieldExtractor({**DEFAULT_FIELD_KEYS, **parse_key_aliases(FIELD_KEY_ALIASES)})
+
+def extract_fields(text):
+    """Extract the template fields from a non-link post"""
+    return field_extractor.extract(text)
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from broadcaster import TokenBucket, retry_after_seconds
+from metrics import registry
+from config import GLOBAL_SEND_RATE, GLOBAL_SEND_BURST, FLOOD_MIN_RATE, FLOOD_BACKOFF_FACTOR, FLOOD_RECOVERY_REQUESTS, FLOOD_RECOVERY_STEP
+
+# Long polling isn't an outbound message and must keep running while sends are paused
+UNTHROTTLED_ENDPOINTS = {"getUpdates"}
+
+class FloodCoordinator(BaseRateLimiter):
+    """Process-wide gate for every Bot API request made through the application's bot.
+
+    All requests share one token bucket. When Telegram answers any request with
+    RetryAfter, every outbound request is paused until the penalty expires and the
+    rate is cut (multiplicative decrease); after a run of clean requests the rate
+    climbs back towards GLOBAL_SEND_RATE (additive increase).
+    """
+
+    def __init__(self, max_rate=GLOBAL_SEND_RATE, min_rate=FLOOD_MIN_RATE, backoff_factor=FLOOD_BACKOFF_FACTOR,
+                 recovery_requests=FLOOD_RECOVERY_REQUESTS, recovery_step=FLOOD_RECOVERY_STEP, burst=GLOBAL_SEND_BURST):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.backoff_factor = backoff_factor
+        self.recovery_requests = recovery_requests
+        self.recovery_step = recovery_step
+        self.rate = max_rate
+        self.bucket = TokenBucket(max_rate, capacity=burst)
+        self.paused_until = 0.0
+        self.flood_events = 0
+        self.requests = 0
+        self.last_flood_at = None
+        self._clean_streak = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def wait_if_paused(self):
+        """Block while a flood-control penalty is active"""
+        while True:
+            remaining = self.paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def _set_rate(self, rate):
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        self.bucket.set_rate(self.rate)
+
+    def record_flood(self, retry_after):
+        """Pause all traffic for `retry_after` seconds and lower the rate"""
+        now = time.monotonic()
+        self.flood_events += 1
+        self.last_flood_at = time.time()
+        self._clean_streak = 0
+        # Concurrent requests usually hit the same penalty; only back off once per pause
+        if now >= self.paused_until:
+            self._set_rate(self.rate * self.backoff_factor)
+            logging.warning(f"Flood control: pausing all sends for {retry_after:.0f}s, rate lowered to {self.rate:.1f} msg/s")
+        self.paused_until = max(self.paused_until, now + retry_after)
+
+    def record_success(self):
+        self.requests += 1
+        self._clean_streak += 1
+        if self.rate < self.max_rate and self._clean_streak >= self.recovery_requests:
+            self._clean_streak = 0
+            self._set_rate(self.rate + self.recovery_step)
+            logging.info(f"Flood control: rate raised to {self.rate:.1f} msg/s")
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint in UNTHROTTLED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+
+        await self.wait_if_paused()
+        await self.bucket.acquire()
+        # A penalty may have started while we were queued for a token
+        await self.wait_if_paused()
+        try:
+            result = await callback(*args, **kwargs)
+        except RetryAfter as e:
+            self.record_flood(retry_after_seconds(e))
+            raise
+        self.record_success()
+        return result
+
+    def state(self):
+        """Current throttle state for monitoring"""
+        return {
+            "rate": round(self.rate, 2),
+            "max_rate": self.max_rate,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "flood_events": self.flood_events,
+            "last_flood_at": self.last_flood_at,
+            "requests": self.requests,
+        }
+
+# Global coordinator installed as the application's rate limiter
+flood_coordinator = FloodCoordinator()
+
+registry.gauge("bot_flood_send_rate", "Current global send rate in requests per second", callback=lambda: flood_coordinator.rate)
+registry.gauge(
+    "bot_flood_paused", "1 while all sends are paused by a flood-control penalty",
+    callback=lambda: int(flood_coordinator.paused_until > time.monotonic())
+)
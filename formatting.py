@@ -0,0 +1,142 @@
+import re
+
+# Patterns are compiled once at import instead of on every post
+URL_RE = re.compile(r'https?://[^\s]+')
+HASHTAG_RE = re.compile(r'#\w+')
+
+# Decorative emoji removed from every line (deleted codepoint by codepoint, like the old character classes)
+_DECORATIVE_CHARS = (
+    '🎬🎭🎪🎨🎯🎲🎰🎸🎺🎻🎤🎧🎵🎶🎼🎹🎺🎸'
+    '⭐️✨💫⚡️🔥💥🌟💯🎉🎊🎈'
+    '➤➡️▶️◀️⬅️↗️↘️⬆️⬇️'
+    '📱💻🖥️📺📹📷📸🎥🎞️'
+)
+EMOJI_TABLE = str.maketrans('', '', _DECORATIVE_CHARS)
+
+# Lines carrying any of these markers are leftovers of an already formatted post.
+# The small-caps words used to be matched against line.lower(); Ʀ and Ɪ are the only
+# characters that lowercase into their letters, so they are folded in explicitly.
+SKIP_LINE_RE = re.compile(
+    'Wᴀᴛᴄʜ Oɴʟɪɴᴇ|Dᴏᴡɴʟᴏᴀᴅ|ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ|Cʜᴀɴɴᴇʟ|═══|━━━|───|▬▬▬|[╔╚]'
+    '|ᴍᴏᴠ[ɪꞮ]ᴇ|ꜰ[ɪꞮ]ʟᴍ|ꜱᴇ[ʀƦ][ɪꞮ]ᴇꜱ|ᴇᴘ[ɪꞮ]ꜱᴏᴅᴇ'
+)
+
+# Noise stripped from titles: release tags, languages, qualities, rips, call-to-action words,
+# bracketed years and file sizes. The passes must run one after another in this order;
+# removing one kind of noise can expose or break up another ("14kbseries", "[20(2024)24]"),
+# so merging them into one alternation changes titles.
+TITLE_NOISE_PATTERNS = (
+    re.compile(r'(?i)movie|film|series|episode|ep|season|s\d+|e\d+'),
+    re.compile(r'(?i)hindi|english|dubbed|dual audio'),
+    re.compile(r'(?i)480p|720p|1080p|4k|hd|full hd'),
+    re.compile(r'(?i)webrip|hdcam|dvdrip|bluray|web-dl'),
+    re.compile(r'(?i)download|watch|online|free'),
+    re.compile(r'\(\d{4}\)'),
+    re.compile(r'\[\d{4}\]'),
+    re.compile(r'(?i)\d+(?:\.\d+)?\s*(?:gb|mb|kb)'),
+)
+TITLE_SPECIAL_CHARS_RE = re.compile(r'[^\w\s\-\.]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+QUALITIES = ('480p', '720p', '1080p')
+
+def clean_line(line):
+    """Strip hashtags and decorative emoji from a line, or return None if it should be skipped"""
+    line = HASHTAG_RE.sub('', line.strip()).strip()
+    # Emoji and skip markers are all non-ASCII, so plain link lines need no further work
+    if line.isascii():
+        return line
+    line = line.translate(EMOJI_TABLE)
+    if SKIP_LINE_RE.search(line):
+        return None
+    return line
+
+def clean_title(title_line):
+    """Reduce a post's first line to the bare title"""
+    title = URL_RE.sub('', title_line)
+    for pattern in TITLE_NOISE_PATTERNS:
+        title = pattern.sub('', title)
+    title = TITLE_SPECIAL_CHARS_RE.sub('', title)
+    return WHITESPACE_RE.sub(' ', title).strip()
+
+def format_movie_links(message_text, urls):
+    """Format movie links with special template"""
+    # Clean message - remove hashtags, non-terabox links, and existing format text
+    cleaned_lines = []
+    for line in message_text.split('\n'):
+        line = clean_line(line)
+        # Keep only terabox links and clean text
+        if line and ('terabox' in line.lower() or 'http' not in line):
+            cleaned_lines.append(line)
+
+    # Start building the formatted message
+    formatted_parts = []
+
+    # Extract title (first line) - clean up extra text and extract links if present
+    title_line = cleaned_lines[0].strip() if cleaned_lines else ""
+    start_index = 1
+
+    if title_line:
+        title = clean_title(title_line)
+        # Only add if meaningful title remains
+        if title and len(title) > 5:
+            formatted_parts.append(f"<b>{title}</b>")
+            formatted_parts.append("")
+    else:
+        start_index = 0
+
+    # Add Watch/Download header
+    formatted_parts.append("<b>📥Wᴀᴛᴄʜ Oɴʟɪɴᴇ / Dᴏᴡɴʟᴏᴀᴅ</b>")
+    formatted_parts.append("")
+
+    # Process links
+    quality_links = {quality: [] for quality in QUALITIES}
+    terabox_links = []
+
+    for line in cleaned_lines[start_index:]:
+        line = line.strip()
+        lowered = line.lower()
+        if line and 'terabox' in lowered:
+            # Extract terabox link
+            link_match = URL_RE.search(line)
+            if link_match:
+                link = link_match.group()
+
+                # Check for quality
+                quality_found = next((quality for quality in QUALITIES if quality in lowered), None)
+
+                if quality_found:
+                    quality_links[quality_found].append(link)
+                else:
+                    terabox_links.append(link)
+
+    # Add quality links
+    has_quality = False
+    for quality in QUALITIES:
+        if quality_links[quality]:
+            formatted_parts.append(f"<b>{quality.upper()} - <a href='{quality_links[quality][0]}'>Download {quality.upper()}</a></b>")
+            formatted_parts.append("")
+            has_quality = True
+
+    # Add 1080p default if no 1080p found but other qualities exist
+    if has_quality and not quality_links['1080p']:
+        formatted_parts.append("<b>1080P - ᴀᴠᴀɪʟᴀʙʟᴇ ɪɴ ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ</b>")
+        formatted_parts.append("")
+
+    # Add links without quality
+    if not has_quality and terabox_links:
+        if len(terabox_links) == 1:
+            formatted_parts.append(f"<b>Lɪɴᴋ - <a href='{terabox_links[0]}'>Download Here</a></b>")
+            formatted_parts.append("")
+        else:
+            for i, link in enumerate(terabox_links, 1):
+                formatted_parts.append(f"<b>Pᴀʀᴛ {i} - <a href='{link}'>Download Part {i}</a></b>")
+                formatted_parts.append("")
+
+    # Add footer with fancy box
+    formatted_parts.append("<b>╔.★. .═════════════════════╗</b>")
+    formatted_parts.append("<b>      ᴅɪʀᴇᴄᴛ ꜰɪʟᴇ ᴄʜᴀɴɴᴇʟ ‒ 29ʀꜱ./ᴍᴏɴᴛʜ</b>")
+    formatted_parts.append("<b>      𝐌ᴀɪɴ Cʜᴀɴɴᴇʟ - <a href='https://t.me/+uCTbb3GPc6AwNTk1'>𝐌ᴜꜱᴛ 𝐉ᴏɪɴ</a></b>")
+    formatted_parts.append("<b>╚═════════════════════. .★.╝</b>")
+
+    return '\n'.join(formatted_parts)
@@ -0,0 +1,11 @@
+from database import db
+from flood_control import flood_coordinator
+
+def health_status():
+    """Payload served by the /health endpoint"""
+    return {
+        "status": "degraded" if db.degraded else "healthy",
+        "service": "telegram_bot",
+        "flood_control": flood_coordinator.state(),
+        "database": db.health(),
+    }
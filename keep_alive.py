@@ -1,5 +1,7 @@
-from flask import Flask
+from flask import Flask, Response
 from threading import Thread
+from health import health_status
+from metrics import CONTENT_TYPE, registry
 import logging
 
 app = Flask(__name__)
@@ -10,7 +12,11 @@ def home():
 
 @app.route('/health')
 def health():
-    return {"status": "healthy", "service": "telegram_bot"}
+    return health_status()
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
 
 def run():
     """Run the Flask server"""
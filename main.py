@@ -1,3 +1,7 @@
+import time
+# Taken before the heavy imports so the cold-start figure includes them
+STARTED_AT = time.monotonic()
+
 import logging
 import sys
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler, filters
@@ -6,8 +10,13 @@ from bot_handlers import (
     list_channels_command, format_command, handle_message,
     button_callback, cancel_command, autoforward_command, forwardstatus_command
 )
-from config import BOT_TOKEN
+from config import BOT_TOKEN, WEBHOOK_URL, PROFILE_HANDLERS
+from database import db
+from post_queue import post_queue
+from flood_control import flood_coordinator
 from keep_alive import keep_alive
+from metrics import monitor_event_loop, timed_handler
+from profiler import profile_handler, loop_watchdog
 import asyncio
 
 # Configure logging
@@ -21,16 +30,46 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+def instrument(handler):
+    """Time a handler for /metrics and, with PROFILE_HANDLERS, profile it"""
+    return timed_handler(profile_handler(handler))
+
+async def on_startup(application):
+    """Start background workers once the bot is initialized"""
+    await post_queue.start(application.bot)
+    logger.info("Post queue worker started")
+    application.bot_data["event_loop_monitor"] = asyncio.create_task(monitor_event_loop())
+    if PROFILE_HANDLERS:
+        loop_watchdog.start()
+    # getMe has completed by now; the database may still be connecting in the background,
+    # in which case the first query waits for it instead of holding up polling
+    db_status = f"database ready in {db.connect_seconds:.2f}s" if db.connected else "database still connecting"
+    logger.info(f"Cold start: bot ready {time.monotonic() - STARTED_AT:.2f}s after launch ({db_status})")
+
+async def on_stop(application):
+    """Stop background workers before the bot shuts down"""
+    await post_queue.stop()
+    monitor = application.bot_data.pop("event_loop_monitor", None)
+    if monitor:
+        monitor.cancel()
+    loop_watchdog.stop()
+
 def main():
     """Main function to run the bot with comprehensive error handling"""
     try:
-        # Start keep alive server with error handling
-        try:
-            keep_alive()
-            logger.info("Keep alive server started successfully")
-        except Exception as e:
-            logger.warning(f"Keep alive server failed to start: {e}")
-            # Continue without keep alive - bot can still work
+        # Connect to MongoDB while the application is built and Telegram answers getMe
+        db.connect_in_background()
+
+        # Start keep alive server with error handling (webhook mode serves /health itself)
+        if not WEBHOOK_URL:
+            try:
+                keep_alive()
+                logger.info("Keep alive server started successfully")
+            except Exception as e:
+                logger.warning(f"Keep alive server failed to start: {e}")
+                # Continue without keep alive - bot can still work
         
         # Validate bot token
         if not BOT_TOKEN or BOT_TOKEN.strip() == "":
@@ -41,38 +80,40 @@ def main():
         
         # Create application with error handling
         try:
-            application = Application.builder().token(BOT_TOKEN).build()
+            # Process updates concurrently so a slow handler doesn't hold up other chats;
+            # every API call goes through the shared flood-control coordinator
+            application = (
+                Application.builder()
+                .token(BOT_TOKEN)
+                .concurrent_updates(True)
+                .rate_limiter(flood_coordinator)
+                .post_init(on_startup)
+                .post_stop(on_stop)
+                .build()
+            )
             logger.info("Telegram application created successfully")
         except Exception as e:
             logger.error(f"Failed to create Telegram application: {e}")
             sys.exit(1)
         
-        # Test database connection
-        try:
-            from database import db
-            logger.info("Database connection established successfully")
-        except Exception as e:
-            logger.error(f"Database connection failed: {e}")
-            logger.error("Bot will continue but database features may not work")
-        
         # Add handlers with error handling
         try:
-            # Commands first
-            application.add_handler(CommandHandler("start", start_command))
-            application.add_handler(CommandHandler("help", help_command))
-            application.add_handler(CommandHandler("addchannel", add_channel_command))
-            application.add_handler(CommandHandler("removechannel", remove_channel_command))
-            application.add_handler(CommandHandler("listchannels", list_channels_command))
-            application.add_handler(CommandHandler("format", format_command))
-            application.add_handler(CommandHandler("forward", autoforward_command))
-            application.add_handler(CommandHandler("forwardstatus", forwardstatus_command))
-            application.add_handler(CommandHandler("cancel", cancel_command))
-            application.add_handler(CallbackQueryHandler(button_callback))
+            # Commands first; every handler is instrumented for /metrics and profiling
+            application.add_handler(CommandHandler("start", instrument(start_command)))
+            application.add_handler(CommandHandler("help", instrument(help_command)))
+            application.add_handler(CommandHandler("addchannel", instrument(add_channel_command)))
+            application.add_handler(CommandHandler("removechannel", instrument(remove_channel_command)))
+            application.add_handler(CommandHandler("listchannels", instrument(list_channels_command)))
+            application.add_handler(CommandHandler("format", instrument(format_command)))
+            application.add_handler(CommandHandler("forward", instrument(autoforward_command)))
+            application.add_handler(CommandHandler("forwardstatus", instrument(forwardstatus_command)))
+            application.add_handler(CommandHandler("cancel", instrument(cancel_command)))
+            application.add_handler(CallbackQueryHandler(instrument(button_callback)))
             
             # Message handler for auto-posting (should be last) - handles both text and photos
             application.add_handler(MessageHandler(
                 (filters.TEXT | filters.PHOTO) & ~filters.COMMAND, 
-                handle_message
+                instrument(handle_message)
             ))
             
             logger.info("All handlers registered successfully")
@@ -83,10 +124,16 @@ def main():
         logger.info("Bot started successfully!")
         logger.info("Ready to receive messages...")
         
+        if WEBHOOK_URL:
+            from webhook_server import run_webhook
+            logger.info(f"Running in webhook mode at {WEBHOOK_URL}")
+            asyncio.run(run_webhook(application, ALLOWED_UPDATES))
+            return
+        
         # Run the bot with comprehensive error handling
         try:
             application.run_polling(
-                allowed_updates=["message", "callback_query"],
+                allowed_updates=ALLOWED_UPDATES,
                 drop_pending_updates=True
             )
         except KeyboardInterrupt:
@@ -97,7 +144,7 @@ def main():
             # Try to restart once
             try:
                 application.run_polling(
-                    allowed_updates=["message", "callback_query"],
+                    allowed_updates=ALLOWED_UPDATES,
                     drop_pending_updates=True
                 )
             except Exception as restart_error:
@@ -0,0 +1,203 @@
+import collections
+import functools
+import logging
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import SCHEDULE_TIMEZONE, SCHEDULE_WINDOW_MINUTES
+
+# Callback data is "<prefix>" or "<prefix>:<argument>"; the prefixes are kept short because
+# Telegram allows only 64 bytes of callback data and channel ids take part of that
+HELP = "h"
+SETTINGS = "s"
+MAIN_MENU = "main"
+MANAGE_CHANNELS = "mc"
+ALL_CHANNELS = "ac"
+ADD_CHANNEL = "add"
+REMOVE_CHANNEL = "rm"
+TOGGLE_CHANNEL = "t"  # t:<channel_id>
+TOGGLE_AUTO_FORWARD = "af"
+SCHEDULE_MENU = "sm"
+TOGGLE_SCHEDULE = "st"
+ADJUST_SCHEDULE = "sa"  # sa:h:<hours> or sa:m:<minutes>
+
+# Callback data used by older versions of the bot; buttons in messages sent before the
+# change still carry it
+LEGACY_CALLBACK_DATA = {
+    "help": HELP,
+    "settings": SETTINGS,
+    "back_to_main": MAIN_MENU,
+    "manage_channels": MANAGE_CHANNELS,
+    "show_all_channels": ALL_CHANNELS,
+    "add_channel": ADD_CHANNEL,
+    "remove_channel": REMOVE_CHANNEL,
+    "toggle_auto_forward": TOGGLE_AUTO_FORWARD,
+    "schedule_menu": SCHEDULE_MENU,
+    "toggle_schedule_timer": TOGGLE_SCHEDULE,
+    "hour_plus": f"{ADJUST_SCHEDULE}:h:1",
+    "hour_minus": f"{ADJUST_SCHEDULE}:h:-1",
+    "minute_plus": f"{ADJUST_SCHEDULE}:m:15",
+    "minute_minus": f"{ADJUST_SCHEDULE}:m:-15",
+}
+LEGACY_TOGGLE_PREFIX = "toggle_"
+
+def encode(prefix, *args):
+    """Callback data for a route and its arguments"""
+    return ":".join((prefix, *map(str, args)))
+
+def decode(data):
+    """Split callback data into (prefix, argument string), translating legacy data first"""
+    data = data or ""
+    if data in LEGACY_CALLBACK_DATA:
+        data = LEGACY_CALLBACK_DATA[data]
+    elif data.startswith(LEGACY_TOGGLE_PREFIX):
+        data = encode(TOGGLE_CHANNEL, data[len(LEGACY_TOGGLE_PREFIX):])
+    prefix, _, argument = data.partition(":")
+    return prefix, argument
+
+class CallbackRouter:
+    """Dispatches callback queries to handlers registered by callback-data prefix.
+
+    A handler is called as handler(query, context, argument) and may return a
+    short notice, which is shown to the user when the query is answered.
+    """
+
+    def __init__(self):
+        self._routes = {}
+
+    def route(self, prefix, admin_only=True):
+        """Decorator registering a handler for `prefix`"""
+        def register(handler):
+            if prefix in self._routes:
+                raise ValueError(f"Callback prefix {prefix!r} is already routed")
+            self._routes[prefix] = (handler, admin_only)
+            return handler
+        return register
+
+    async def dispatch(self, query, context, is_admin):
+        prefix, argument = decode(query.data)
+        route = self._routes.get(prefix)
+        notice = None
+        try:
+            if route is None:
+                logging.warning(f"Unknown callback data: {query.data!r}")
+                return
+            handler, admin_only = route
+            if admin_only and not is_admin(query.from_user.id):
+                return
+            notice = await handler(query, context, argument)
+        finally:
+            # A callback query can only be answered once
+            await query.answer(notice)
+
+# Shared by button_callback
+callback_router = CallbackRouter()
+
+class EditMemo:
+    """Remembers, per (chat_id, message_id), how a menu message is edited and what it shows.
+
+    Photo messages need editMessageCaption and text messages editMessageText, so
+    knowing the kind saves the failed first attempt; knowing the content lets an
+    unchanged screen skip the edit, which Telegram would answer with "message is
+    not modified". Only the most recently used messages are kept.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        # (chat_id, message_id) -> [is_photo, text, reply_markup]
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, is_photo, text=None, reply_markup=None):
+        self._entries[key] = [is_photo, text, reply_markup]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+# Shared by the menu edits in bot_handlers
+edit_memo = EditMemo()
+
+# Menu screens. Keyboards and texts are built once per state and reused; InlineKeyboardMarkup
+# is immutable, so sharing one instance between messages is safe.
+
+BACK_TO_MAIN_BUTTON = InlineKeyboardButton("🔙 Back", callback_data=MAIN_MENU)
+BACK_TO_CHANNELS_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data=MANAGE_CHANNELS)]])
+
+SETTINGS_TEXT = "⚙️ <b>Settings</b>\n\nThis is a dummy settings menu. All main features are available directly from the main menu!"
+SETTINGS_KEYBOARD = InlineKeyboardMarkup([[BACK_TO_MAIN_BUTTON]])
+
+MANAGE_CHANNELS_TEXT = "📢 <b>Channel Management</b>\n\nChoose an option:"
+MANAGE_CHANNELS_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📋 All Channels", callback_data=ALL_CHANNELS)],
+    [InlineKeyboardButton("➕ Add Channel", callback_data=ADD_CHANNEL), InlineKeyboardButton("➖ Remove Channel", callback_data=REMOVE_CHANNEL)],
+    [BACK_TO_MAIN_BUTTON]
+])
+
+NO_CHANNELS_TEXT = "📭 <b>No channels configured</b>\n\nUse Add Channel option to add channels."
+ADD_CHANNEL_TEXT = "➕ <b>Add Channel</b>\n\nUse the command: <code>/addchannel @channel_id [Channel Name]</code>\n\nExample:\n<code>/addchannel @mychannel [My Movie Channel]</code>"
+REMOVE_CHANNEL_TEXT = "➖ <b>Remove Channel</b>\n\nUse the command: <code>/removechannel Channel Name</code> or <code>/removechannel @channel_id</code>\n\nExamples:\n<code>/removechannel My Movie Channel</code>\n<code>/removechannel @mychannel</code>"
+
+def on_off(enabled):
+    return "🟢 ON" if enabled else "🔴 OFF"
+
+@functools.lru_cache(maxsize=None)
+def main_menu_keyboard(admin):
+    """Keyboard under the start message"""
+    if admin:
+        return InlineKeyboardMarkup([
+            [InlineKeyboardButton("Manage Channels", callback_data=MANAGE_CHANNELS), InlineKeyboardButton("Help", callback_data=HELP)]
+        ])
+    return InlineKeyboardMarkup([[InlineKeyboardButton("Help", callback_data=HELP)]])
+
+@functools.lru_cache(maxsize=None)
+def admin_menu_keyboard(auto_forward, timer_enabled):
+    """Main menu with the auto forward and schedule timer switches"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("Manage Channels", callback_data=MANAGE_CHANNELS)],
+        [InlineKeyboardButton(f"🚀 Auto Forward: {on_off(auto_forward)}", callback_data=TOGGLE_AUTO_FORWARD)],
+        [InlineKeyboardButton(f"⏰ Schedule Timer: {on_off(timer_enabled)}", callback_data=SCHEDULE_MENU)],
+        [InlineKeyboardButton("📊 Settings", callback_data=SETTINGS)]
+    ])
+
+@functools.lru_cache(maxsize=8)
+def channels_menu(channels):
+    """(text, keyboard) of the All Channels screen; `channels` is a tuple of (channel_id, name, active)"""
+    if not channels:
+        return NO_CHANNELS_TEXT, BACK_TO_CHANNELS_KEYBOARD
+    text = "📢 <b>All Channels</b>\n\nClick to toggle forwarding:\n\n"
+    keyboard = []
+    for channel_id, name, active in channels:
+        text += f"<code>{name}</code> - {'Active' if active else 'Inactive'}\n"
+        # Shows the display name but toggles by ID
+        keyboard.append([InlineKeyboardButton(f"{'✅' if active else '❌'} {name}", callback_data=encode(TOGGLE_CHANNEL, channel_id))])
+    keyboard.append([InlineKeyboardButton("🔙 Back", callback_data=MANAGE_CHANNELS)])
+    return text, InlineKeyboardMarkup(keyboard)
+
+def channels_key(channels):
+    """Hashable form of get_all_channels_with_status() for channels_menu"""
+    return tuple((c["channel_id"], c["channel_name"], c["active"]) for c in channels)
+
+@functools.lru_cache(maxsize=None)
+def schedule_keyboard(enabled):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"🔄 Toggle Timer: {on_off(enabled)}", callback_data=TOGGLE_SCHEDULE)],
+        [InlineKeyboardButton("🕐 Set Hour +", callback_data=encode(ADJUST_SCHEDULE, "h", 1)),
+         InlineKeyboardButton("🕐 Set Hour -", callback_data=encode(ADJUST_SCHEDULE, "h", -1))],
+        [InlineKeyboardButton("🕕 Set Minute +", callback_data=encode(ADJUST_SCHEDULE, "m", 15)),
+         InlineKeyboardButton("🕕 Set Minute -", callback_data=encode(ADJUST_SCHEDULE, "m", -15))],
+        [InlineKeyboardButton("🔙 Back to Main", callback_data=MAIN_MENU)]
+    ])
+
+def schedule_menu(timer):
+    """(text, keyboard) of the schedule timer screen for a get_schedule_timer() dict"""
+    text = (
+        f"⏰ <b>Schedule Timer Settings</b>\n\n"
+        f"Current Time: <code>{timer['hours']:02d}:{timer['minutes']:02d}</code>\n"
+        f"Status: {on_off(timer['enabled'])}\n\n"
+        f"Posts are published for {SCHEDULE_WINDOW_MINUTES} min from this time ({SCHEDULE_TIMEZONE}); "
+        f"posts sent outside the window are held until it opens."
+    )
+    return text, schedule_keyboard(timer["enabled"])
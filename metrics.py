@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import functools
+import logging
+import threading
+import time
+from config import EVENT_LOOP_LAG_INTERVAL
+
+# Seconds; covers fast cache hits up to sends stuck behind flood control
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    escaped = [
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base for a labelled metric; updates take a lock so database threads can record too"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = list(self._values.items())
+        for labels, value in samples:
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    """Value that goes up and down; `callback` makes it read its value at scrape time instead"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        if self.callback is not None:
+            try:
+                self.set(self.callback())
+            except Exception as e:
+                logging.error(f"Error reading gauge {self.name}: {e}")
+        return super().render()
+
+class Histogram(Metric):
+    """Distribution of observations in fixed buckets, plus their count and sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # Only the matching bucket is counted here; render() makes them cumulative
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _render_sample(self, labels, state):
+        counts, total = state
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            label_text = _format_labels(self.labelnames, labels, (("le", _format_value(float(bound))),))
+            lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Holds the bot's metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Text exposition of every metric, as served on /metrics"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Shared registry and the bot's metrics
+registry = MetricsRegistry()
+
+handler_seconds = registry.histogram("bot_handler_seconds", "Time spent in each update handler", ("handler",))
+handler_errors = registry.counter("bot_handler_errors_total", "Update handlers that raised", ("handler",))
+send_seconds = registry.histogram(
+    "bot_send_seconds", "Time to deliver a post to a channel, including retries", ("channel",)
+)
+send_errors = registry.counter(
+    "bot_send_errors_total", "Failed send attempts by channel and reason", ("channel", "reason")
+)
+db_query_seconds = registry.histogram("bot_db_query_seconds", "Database calls made through the async facade", ("operation",))
+queue_jobs = registry.gauge("bot_queue_jobs", "Unfinished broadcast jobs seen by the post queue")
+queue_deliveries = registry.gauge("bot_queue_pending_deliveries", "Channel deliveries waiting to be sent")
+event_loop_lag = registry.histogram(
+    "bot_event_loop_lag_seconds", "How late the event loop ran a timer",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+def timed_handler(handler):
+    """Wrap an update handler so its latency and failures are recorded under its name"""
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(time.monotonic() - started, name)
+    return wrapper
+
+async def monitor_event_loop(interval=EVENT_LOOP_LAG_INTERVAL):
+    """Sleep for `interval` over and over and record how much later than that the loop woke us"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - started - interval))
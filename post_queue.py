@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import time
+from albums import album_media
+from database import async_db
+from broadcaster import dispatcher, describe_failure, send_photo_cached, summarize_latency
+from scheduler import ScheduleWindow
+from metrics import queue_deliveries, queue_jobs
+from config import BROADCAST_COLLECT_SECONDS, BROADCAST_BATCH_MAX_JOBS, STAGING_CHANNEL_ID, COPY_BATCH_SIZE
+
+def post_order(job):
+    """Sort key putting jobs in the order the admin sent the posts.
+
+    Jobs are created when a post is ready to send, which isn't always the order it
+    was sent in: an album waits for its other photos, and previews take different
+    times. The source message's date and id keep the order; jobs created before
+    they were recorded fall back to their creation time.
+    """
+    return (job.get("posted_at") or job["created_at"], job.get("source_message_id") or 0, job["created_at"])
+
+def _describe_attempts(result):
+    if not result.attempts:
+        return "skipped"
+    return f"{result.attempts} attempt(s), {result.latency:.1f}s"
+
+def build_report(results, unknown_channels, already_sent=0):
+    """Admin-facing summary of one broadcast job"""
+    success_count = already_sent + sum(1 for r in results if r.success)
+    failed_channels = [
+        f"{r.channel_id} ({describe_failure(r.error)}, {_describe_attempts(r)})"
+        for r in results if not r.success
+    ]
+
+    if success_count == 0 and not unknown_channels:
+        return "❌ Failed to post to any channels.\n\n🔍 Common issues:\n• Bot not added to channel\n• No posting permissions\n• Rate limiting\n• Invalid channel ID\n\nCheck your channel settings and try again."
+
+    avg_latency, max_latency = summarize_latency(results)
+    report = f"✅ Message posted to {success_count} channel(s)"
+    if results:
+        report += f"\n⏱ Avg latency: {avg_latency:.1f}s, slowest: {max_latency:.1f}s"
+    if failed_channels:
+        report += "\n\n❌ Failed channels:"
+        for failed in failed_channels:
+            report += f"\n• {failed}"
+        report += f"\n\n💡 Check channel permissions and try again later for failed channels."
+    if unknown_channels:
+        report += "\n\n⚠️ The bot restarted while posting to these channels, check them manually:"
+        for channel_id in unknown_channels:
+            report += f"\n• {channel_id}"
+    return report
+
+def build_batch_report(job_reports):
+    """Admin-facing summary of several jobs sent as one batch; `job_reports` is a list of (results, unknown_channels, already_sent)"""
+    results = [r for job_results, _, _ in job_reports for r in job_results]
+    delivered = sum(already_sent + sum(1 for r in job_results if r.success) for job_results, _, already_sent in job_reports)
+    total = sum(len(job_results) + len(unknown) + already_sent for job_results, unknown, already_sent in job_reports)
+
+    # channel_id -> failed results, so a channel that rejects every post is listed once
+    failures = {}
+    for r in results:
+        if not r.success:
+            failures.setdefault(r.channel_id, []).append(r)
+    unknown_channels = sorted({channel_id for _, unknown, _ in job_reports for channel_id in unknown}, key=str)
+
+    avg_latency, max_latency = summarize_latency(results)
+    report = f"📦 Bulk post finished: {len(job_reports)} post(s)\n✅ {delivered}/{total} deliveries succeeded"
+    if results:
+        report += f"\n⏱ Avg latency: {avg_latency:.1f}s, slowest: {max_latency:.1f}s"
+    if failures:
+        report += "\n\n❌ Failed channels:"
+        for channel_id, failed in failures.items():
+            report += f"\n• {channel_id}: {len(failed)} post(s) ({describe_failure(failed[-1].error)})"
+        report += f"\n\n💡 Check channel permissions and try again later for failed channels."
+    if unknown_channels:
+        report += "\n\n⚠️ The bot restarted while posting to these channels, check them manually:"
+        for channel_id in unknown_channels:
+            report += f"\n• {channel_id}"
+    return report
+
+class PostQueue:
+    """Background worker that drains durable broadcast jobs from the database.
+
+    Every delivery is recorded before and after it is sent, so a job interrupted
+    by a restart resumes with the channels that were still pending. While the
+    schedule timer's window is closed jobs are held.
+
+    Jobs queued close together are sent as one batch: their deliveries are merged
+    into an ordered stream per channel, the channels are interleaved under the
+    dispatcher's rate limits, and each admin gets one report for the whole batch.
+    With a staging channel configured, posts are sent there once and copied to
+    the channels, several posts per copyMessages call.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.bot = None
+        self._last_enqueued = 0.0
+
+    async def enqueue(self, payload, channels, reply_chat_id, source_message_id=None, posted_at=None):
+        """Store a broadcast job and wake the worker; returns the job id or None.
+
+        `source_message_id` and `posted_at` identify the admin's message, so posts
+        reach the channels in the order they were sent.
+        """
+        job_id = await async_db.create_broadcast_job(payload, channels, reply_chat_id, source_message_id, posted_at)
+        if job_id:
+            self._last_enqueued = time.monotonic()
+            self._wakeup.set()
+        return job_id
+
+    async def start(self, bot):
+        """Start draining the queue; interrupted jobs are recovered first, off the startup path"""
+        self.bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Re-check the queue now, e.g. after the schedule timer changed"""
+        self._wakeup.set()
+
+    async def _wait(self, timeout=None):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def stop(self):
+        """Stop the worker; unfinished jobs stay in the database for the next start"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        success, message = await async_db.recover_broadcast_jobs()
+        logging.info(message)
+        while True:
+            self._wakeup.clear()
+            jobs = await async_db.get_unfinished_jobs()
+            queue_jobs.set(len(jobs))
+            queue_deliveries.set(sum(1 for job in jobs for d in job["deliveries"] if d["status"] == "pending"))
+            if not jobs:
+                await self._wait()
+                continue
+
+            window = ScheduleWindow.from_settings(await async_db.get_schedule_timer())
+            if not window.is_open():
+                delay = window.seconds_until_open()
+                logging.info(f"Holding {len(jobs)} post(s) until the schedule window opens in {delay / 60:.0f} min")
+                # Woken early if the admin changes the timer
+                await self._wait(delay)
+                continue
+
+            quiet = self._last_enqueued + BROADCAST_COLLECT_SECONDS - time.monotonic()
+            if quiet > 0 and len(jobs) < BROADCAST_BATCH_MAX_JOBS:
+                # More posts are probably on the way; let them join this batch
+                await asyncio.sleep(quiet)
+                continue
+
+            jobs.sort(key=post_order)
+            batch = jobs[:BROADCAST_BATCH_MAX_JOBS]
+            try:
+                await self._process_batch(batch)
+            except Exception as e:
+                # Leave the jobs in place; they are retried on the next pass
+                logging.error(f"Error processing a batch of {len(batch)} broadcast job(s): {e}")
+                await asyncio.sleep(5)
+
+    async def _send(self, payload, channel_id):
+        """Send a payload to one chat; returns the ids of the messages it created"""
+        if payload.get("type") == "album":
+            # One call per channel for the whole album
+            messages = await self.bot.send_media_group(chat_id=channel_id, media=album_media(payload))
+            return [message.message_id for message in messages]
+        message = await send_photo_cached(
+            self.bot.send_photo,
+            payload["photo"],
+            self.bot.id,
+            chat_id=channel_id,
+            caption=payload["caption"],
+            parse_mode=payload.get("parse_mode", "HTML")
+        )
+        return [message.message_id]
+
+    async def _stage(self, streams):
+        """Post every job that has pending deliveries to the staging channel; returns job id -> staged message ids"""
+        jobs = {}
+        for items in streams.values():
+            for job, _ in items:
+                jobs.setdefault(job["_id"], job)
+        staged = {}
+
+        async def stage(chat_id, job):
+            staged[job["_id"]] = await self._send(job["payload"], chat_id)
+
+        # In job order, so staged message ids increase the way copyMessages needs them to
+        for job, result in await dispatcher.stream({STAGING_CHANNEL_ID: list(jobs.values())}, stage):
+            if not result.success:
+                logging.warning(f"Couldn't stage broadcast job {job['_id']}, sending it to each channel instead: {result.error}")
+        return staged
+
+    @staticmethod
+    def _chunk(items, staged):
+        """Group one channel's deliveries into sends; consecutive staged posts share a copyMessages call"""
+        chunks = []
+        size = 0
+        for job, index in items:
+            message_ids = staged.get(job["_id"])
+            if message_ids and chunks and chunks[-1][-1][0]["_id"] in staged and size + len(message_ids) <= COPY_BATCH_SIZE:
+                chunks[-1].append((job, index))
+                size += len(message_ids)
+            else:
+                chunks.append([(job, index)])
+                size = len(message_ids) if message_ids else 0
+        return chunks
+
+    async def _send_chunk(self, chunk, channel_id, staged):
+        message_ids = [message_id for job, _ in chunk for message_id in staged.get(job["_id"], ())]
+        if not message_ids:
+            await self._send(chunk[0][0]["payload"], channel_id)
+        elif len(message_ids) == 1:
+            await self.bot.copy_message(chat_id=channel_id, from_chat_id=STAGING_CHANNEL_ID, message_id=message_ids[0])
+        else:
+            # Albums stay grouped when copied together
+            await self.bot.copy_messages(chat_id=channel_id, from_chat_id=STAGING_CHANNEL_ID, message_ids=message_ids)
+
+    async def _process_batch(self, jobs):
+        streams = {}  # channel_id -> [(job, delivery index)], in job order
+        unknown_channels = {job["_id"]: [] for job in jobs}
+        already_sent = {job["_id"]: 0 for job in jobs}
+        for job in jobs:
+            for index, delivery in enumerate(job["deliveries"]):
+                if delivery["status"] == "pending":
+                    streams.setdefault(delivery["channel_id"], []).append((job, index))
+                elif delivery["status"] in ("sending", "unknown"):
+                    unknown_channels[job["_id"]].append(delivery["channel_id"])
+                elif delivery["status"] == "sent":
+                    already_sent[job["_id"]] += 1
+
+        progress = await self._start_progress(jobs)
+        staged = await self._stage(streams) if STAGING_CHANNEL_ID and streams else {}
+        chunks = {channel_id: self._chunk(items, staged) for channel_id, items in streams.items()}
+
+        async def send_chunk(channel_id, chunk):
+            for job, index in chunk:
+                await async_db.update_delivery(job["_id"], index, status="sending")
+            try:
+                await self._send_chunk(chunk, channel_id, staged)
+            except Exception:
+                for job, index in chunk:
+                    await async_db.update_delivery(job["_id"], index, status="pending")
+                raise
+            for job, index in chunk:
+                await async_db.update_delivery(job["_id"], index, status="sent")
+
+        delivered = await dispatcher.stream(chunks, send_chunk)
+
+        results = {job["_id"]: [] for job in jobs}
+        updates = {job["_id"]: {} for job in jobs}
+        for chunk, result in delivered:
+            for job, index in chunk:
+                results[job["_id"]].append(result)
+                updates[job["_id"]][index] = {
+                    "status": "sent" if result.success else "failed",
+                    "attempts": result.attempts,
+                    "latency": round(result.latency, 3),
+                    "error": str(result.error) if result.error else None
+                }
+        for job in jobs:
+            if updates[job["_id"]]:
+                await async_db.update_deliveries(job["_id"], updates[job["_id"]])
+            await async_db.finish_broadcast_job(job["_id"])
+
+        for chat_id, job_ids in self._jobs_by_chat(jobs).items():
+            if len(job_ids) == 1:
+                job_id = job_ids[0]
+                report = build_report(results[job_id], unknown_channels[job_id], already_sent[job_id])
+            else:
+                report = build_batch_report([
+                    (results[job_id], unknown_channels[job_id], already_sent[job_id]) for job_id in job_ids
+                ])
+            await self._report(chat_id, report, progress.get(chat_id))
+
+    @staticmethod
+    def _jobs_by_chat(jobs):
+        """reply_chat_id -> ids of its jobs, for jobs that want a report"""
+        by_chat = {}
+        for job in jobs:
+            if job.get("reply_chat_id"):
+                by_chat.setdefault(job["reply_chat_id"], []).append(job["_id"])
+        return by_chat
+
+    async def _start_progress(self, jobs):
+        """Tell admins with several posts in the batch that it started; returns chat_id -> message to edit later"""
+        progress = {}
+        channels = {}
+        for job in jobs:
+            channels.setdefault(job.get("reply_chat_id"), set()).update(d["channel_id"] for d in job["deliveries"])
+        for chat_id, job_ids in self._jobs_by_chat(jobs).items():
+            if len(job_ids) == 1:
+                continue
+            try:
+                progress[chat_id] = await self.bot.send_message(
+                    chat_id, f"📤 Posting {len(job_ids)} posts to {len(channels[chat_id])} channel(s)..."
+                )
+            except Exception as e:
+                logging.error(f"Failed to send broadcast progress: {e}")
+        return progress
+
+    async def _report(self, chat_id, report, progress_message=None):
+        if progress_message is not None:
+            try:
+                await self.bot.edit_message_text(report, chat_id=chat_id, message_id=progress_message.message_id)
+                return
+            except Exception as e:
+                logging.warning(f"Failed to update broadcast progress, sending the report instead: {e}")
+        try:
+            await self.bot.send_message(chat_id, report)
+        except Exception as e:
+            logging.error(f"Failed to send broadcast report: {e}")
+
+# Global queue instance, started from main once the bot is initialized
+post_queue = PostQueue()
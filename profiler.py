@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+from config import PROFILE_HANDLERS, SLOW_HANDLER_SECONDS, LOOP_STALL_SECONDS
+from metrics import registry
+
+handler_blocking_seconds = registry.histogram(
+    "bot_handler_blocking_seconds", "Time handlers ran on the event loop between awaits (profiling only)", ("handler",)
+)
+loop_stalls = registry.counter("bot_event_loop_stalls_total", "Times the event loop was stuck longer than LOOP_STALL_SECONDS")
+
+class StepTimer:
+    """Awaitable that runs a coroutine while timing each step it takes on the event loop.
+
+    A step is the stretch of code between two awaits that actually suspend, so the
+    sum of the steps is the time the coroutine kept the loop busy: its own
+    computation plus any blocking call such as a synchronous pymongo query.
+    """
+
+    def __init__(self, coro):
+        self.coro = coro
+        self.blocked = 0.0
+        self.longest = 0.0
+        self.steps = 0
+
+    def _record(self, started):
+        elapsed = time.perf_counter() - started
+        self.blocked += elapsed
+        self.longest = max(self.longest, elapsed)
+        self.steps += 1
+
+    def __await__(self):
+        coro = self.coro
+        value = error = None
+        while True:
+            started = time.perf_counter()
+            try:
+                if error is None:
+                    yielded = coro.send(value)
+                else:
+                    yielded = coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self._record(started)
+
+            value = error = None
+            try:
+                value = yield yielded
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:
+                # Cancellation and errors set on awaited futures go to the wrapped coroutine
+                error = e
+
+def profile_handler(handler, threshold=SLOW_HANDLER_SECONDS, enabled=PROFILE_HANDLERS):
+    """Wrap an update handler to log it when it is slow; returns it unchanged unless profiling is enabled"""
+    if not enabled:
+        return handler
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        timer = StepTimer(handler(*args, **kwargs))
+        started = time.perf_counter()
+        try:
+            return await timer
+        finally:
+            wall = time.perf_counter() - started
+            handler_blocking_seconds.observe(timer.blocked, name)
+            if wall >= threshold or timer.longest >= LOOP_STALL_SECONDS:
+                logging.warning(
+                    f"Slow handler {name}: {wall:.2f}s wall, {timer.blocked:.2f}s blocking the event loop "
+                    f"over {timer.steps} step(s), longest step {timer.longest:.2f}s"
+                )
+    return wrapper
+
+class LoopWatchdog:
+    """Logs the event loop thread's stack when the loop stops answering heartbeats.
+
+    A coroutine on the loop updates a timestamp every `interval` seconds and a
+    daemon thread checks it. When the timestamp is more than `threshold` seconds
+    old the loop is stuck in a synchronous call, so the thread samples the loop
+    thread's current stack with sys._current_frames and logs it once per stall.
+    """
+
+    def __init__(self, threshold=LOOP_STALL_SECONDS):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start watching the running event loop; call from a coroutine on that loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        logging.info(f"Event loop watchdog started (stall threshold {self.threshold:.2f}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _beat(self):
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        stalled_at = None
+        while not self._stop.wait(self.interval):
+            behind = time.monotonic() - self._heartbeat
+            if behind < self.threshold + self.interval:
+                if stalled_at is not None:
+                    logging.warning(f"Event loop recovered after a {time.monotonic() - stalled_at:.2f}s stall")
+                    stalled_at = None
+                continue
+            if stalled_at is None:
+                stalled_at = self._heartbeat
+                loop_stalls.inc()
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else "(stack unavailable)\n"
+                logging.warning(f"Event loop stalled for {behind:.2f}s, loop thread is at:\n{stack.rstrip()}")
+
+# Started from main when PROFILE_HANDLERS is enabled
+loop_watchdog = LoopWatchdog()
@@ -0,0 +1,47 @@
+import datetime
+from zoneinfo import ZoneInfo
+from config import SCHEDULE_WINDOW_MINUTES, SCHEDULE_TIMEZONE
+
+class ScheduleWindow:
+    """Daily posting window that opens at hours:minutes and stays open for `duration_minutes`"""
+
+    def __init__(self, hours, minutes, enabled, duration_minutes=SCHEDULE_WINDOW_MINUTES, timezone=SCHEDULE_TIMEZONE):
+        self.hours = hours
+        self.minutes = minutes
+        self.enabled = enabled
+        self.duration = datetime.timedelta(minutes=duration_minutes)
+        self.timezone = ZoneInfo(timezone)
+
+    @classmethod
+    def from_settings(cls, timer_settings):
+        """Build a window from Database.get_schedule_timer() output"""
+        return cls(timer_settings["hours"], timer_settings["minutes"], timer_settings["enabled"])
+
+    def _now(self, now=None):
+        return now.astimezone(self.timezone) if now else datetime.datetime.now(self.timezone)
+
+    def _last_open(self, now):
+        """Most recent opening time at or before `now`"""
+        opens = now.replace(hour=self.hours, minute=self.minutes, second=0, microsecond=0)
+        if opens > now:
+            opens -= datetime.timedelta(days=1)
+        return opens
+
+    def is_open(self, now=None):
+        """True if posts may be published right now (always, when the timer is disabled)"""
+        if not self.enabled:
+            return True
+        now = self._now(now)
+        return now < self._last_open(now) + self.duration
+
+    def next_open(self, now=None):
+        """Next time the window opens (now, if it is already open)"""
+        now = self._now(now)
+        if self.is_open(now):
+            return now
+        return self._last_open(now) + datetime.timedelta(days=1)
+
+    def seconds_until_open(self, now=None):
+        """Seconds until posting is allowed again"""
+        now = self._now(now)
+        return max(0.0, (self.next_open(now) - now).total_seconds())
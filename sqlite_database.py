@@ -0,0 +1,493 @@
+import contextlib
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from config import (
+    CHANNELS_COLLECTION, FORMATS_COLLECTION, SETTINGS_COLLECTION, MEDIA_CACHE_COLLECTION,
+    DEFAULT_FORMAT, DEFAULT_START_MESSAGE, SQLITE_BUSY_TIMEOUT
+)
+from database import Storage, cached_read
+from templates import TemplateError, compile_template
+
+# (path, value) pairs per json_set call; SQLite caps function arguments at 127
+JSON_SET_MAX_PATHS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    channel_name TEXT UNIQUE,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS channels_active ON channels (active);
+CREATE TABLE IF NOT EXISTS formats (type TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS settings (type TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS media_cache (
+    url TEXT NOT NULL,
+    bot_id INTEGER NOT NULL,
+    file_id TEXT NOT NULL,
+    PRIMARY KEY (url, bot_id)
+);
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    finished_at TEXT,
+    reply_chat_id INTEGER,
+    source_message_id INTEGER,
+    posted_at TEXT,
+    payload TEXT NOT NULL,
+    deliveries TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS broadcast_jobs_status ON broadcast_jobs (status, created_at);
+"""
+
+# Columns added to broadcast_jobs after its first release; older files get them on connect
+BROADCAST_JOB_COLUMNS = {"source_message_id": "INTEGER", "posted_at": "TEXT"}
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+class SQLiteDatabase(Storage):
+    """Local SQLite storage backend with the same method surface as the MongoDB one.
+
+    Each thread gets its own connection to a WAL-mode database file, so reads
+    don't wait for writers. Settings and formats are stored as JSON documents
+    keyed by type, like their MongoDB counterparts.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        # Per-thread connections need no extra locking; MemoryDatabase shares one connection
+        self._lock = contextlib.nullcontext()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a power loss can drop the last commits but never corrupts the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _raw_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def _connection(self):
+        if not self.connected:
+            self.connect()
+        return self._raw_connection()
+
+    def _connect(self):
+        try:
+            conn = self._raw_connection()
+            conn.executescript(SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(broadcast_jobs)")}
+            for column, column_type in BROADCAST_JOB_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE broadcast_jobs ADD COLUMN {column} {column_type}")
+            # Same defaults MongoDB's initialize_defaults writes
+            conn.execute(
+                "INSERT OR IGNORE INTO formats (type, data) VALUES ('current_format', ?)",
+                (json.dumps({"format": DEFAULT_FORMAT}),)
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO settings (type, data) VALUES ('start_message', ?)",
+                (json.dumps({"message": DEFAULT_START_MESSAGE}),)
+            )
+        except Exception as e:
+            logging.error(f"Database connection failed: {e}")
+            raise
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Connection inside a write transaction, committed on success and rolled back on error"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _get_document(self, table, doc_type, conn=None):
+        sql = f"SELECT data FROM {table} WHERE type = ?"
+        rows = conn.execute(sql, (doc_type,)).fetchall() if conn else self._query(sql, (doc_type,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    def _set_fields(self, conn, table, doc_type, fields):
+        # Upsert that merges `fields` into the stored document, like Mongo's $set with upsert=True
+        conn.execute(
+            f"INSERT INTO {table} (type, data) VALUES (?, ?) "
+            "ON CONFLICT(type) DO UPDATE SET data = json_patch(data, excluded.data)",
+            (doc_type, json.dumps(fields))
+        )
+
+    def _toggle_setting(self, doc_type, default):
+        """Flip a setting's enabled flag in one transaction and return the stored document"""
+        with self._transaction() as conn:
+            setting_doc = self._get_document("settings", doc_type, conn) or {}
+            setting_doc["enabled"] = not setting_doc.get("enabled", default)
+            self._set_fields(conn, "settings", doc_type, {"enabled": setting_doc["enabled"]})
+        self.invalidate(SETTINGS_COLLECTION)
+        return setting_doc
+
+    def add_channel(self, channel_id):
+        """Add a channel to the database"""
+        try:
+            with self._transaction() as conn:
+                conn.execute("INSERT INTO channels (channel_id, active) VALUES (?, 1)", (channel_id,))
+            self.invalidate(CHANNELS_COLLECTION)
+            return True, "Channel added successfully"
+        except sqlite3.IntegrityError:
+            return False, "Channel already exists"
+        except Exception as e:
+            logging.error(f"Error adding channel: {e}")
+            return False, f"Error: {e}"
+
+    def add_channel_with_name(self, channel_id, channel_name):
+        """Add a channel with custom name to the database"""
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO channels (channel_id, channel_name, active) VALUES (?, ?, 1)",
+                    (channel_id, channel_name)
+                )
+            self.invalidate(CHANNELS_COLLECTION)
+            return True, f"Channel '{channel_name}' added successfully"
+        except sqlite3.IntegrityError:
+            return False, "Channel with this ID or name already exists"
+        except Exception as e:
+            logging.error(f"Error adding channel with name: {e}")
+            return False, f"Error: {e}"
+
+    def remove_channel(self, channel_id):
+        """Remove a channel from the database"""
+        try:
+            with self._transaction() as conn:
+                deleted = conn.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,)).rowcount
+            self.invalidate(CHANNELS_COLLECTION)
+            if deleted > 0:
+                return True, "Channel removed successfully"
+            return False, "Channel not found"
+        except Exception as e:
+            logging.error(f"Error removing channel: {e}")
+            return False, f"Error: {e}"
+
+    def remove_channel_by_name(self, channel_name):
+        """Remove a channel by its display name"""
+        try:
+            with self._transaction() as conn:
+                deleted = conn.execute("DELETE FROM channels WHERE channel_name = ?", (channel_name,)).rowcount
+            self.invalidate(CHANNELS_COLLECTION)
+            if deleted > 0:
+                return True, f"Channel '{channel_name}' removed successfully"
+            return False, f"Channel '{channel_name}' not found"
+        except Exception as e:
+            logging.error(f"Error removing channel by name: {e}")
+            return False, f"Error: {e}"
+
+    @cached_read(CHANNELS_COLLECTION, fallback=[])
+    def get_channels(self, active_only=True):
+        """Get all channels from the database"""
+        where = " WHERE active = 1" if active_only else ""
+        return [row["channel_id"] for row in self._query(f"SELECT channel_id FROM channels{where} ORDER BY rowid")]
+
+    @cached_read(CHANNELS_COLLECTION, fallback=[])
+    def get_channels_display(self, active_only=True):
+        """Get channels with display names for UI"""
+        where = " WHERE active = 1" if active_only else ""
+        rows = self._query(f"SELECT coalesce(channel_name, channel_id) AS name FROM channels{where} ORDER BY rowid")
+        return [row["name"] for row in rows]
+
+    @cached_read(CHANNELS_COLLECTION, fallback=[])
+    def get_all_channels_with_status(self):
+        """Get all channels with their active status"""
+        rows = self._query("SELECT channel_id, coalesce(channel_name, channel_id) AS name, active FROM channels ORDER BY rowid")
+        return [
+            {"channel_id": row["channel_id"], "channel_name": row["name"], "active": bool(row["active"])}
+            for row in rows
+        ]
+
+    def toggle_channel(self, channel_id):
+        """Toggle channel active status; returns (success, message, new active status)"""
+        try:
+            with self._transaction() as conn:
+                conn.execute("UPDATE channels SET active = NOT active WHERE channel_id = ?", (channel_id,))
+                rows = conn.execute(
+                    "SELECT coalesce(channel_name, channel_id) AS name, active FROM channels WHERE channel_id = ?",
+                    (channel_id,)
+                ).fetchall()
+            if not rows:
+                return False, "Channel not found", None
+            self.invalidate(CHANNELS_COLLECTION)
+            active = bool(rows[0]["active"])
+            status_text = "activated" if active else "deactivated"
+            return True, f"'{rows[0]['name']}' {status_text} successfully", active
+        except Exception as e:
+            logging.error(f"Error toggling channel: {e}")
+            return False, f"Error: {e}", None
+
+    def set_format(self, format_text):
+        """Validate and set the current format; its version is bumped so compiled copies are refreshed"""
+        try:
+            compile_template(format_text)
+            with self._transaction() as conn:
+                format_doc = self._get_document("formats", "current_format", conn) or {}
+                version = format_doc.get("version", 0) + 1
+                self._set_fields(conn, "formats", "current_format", {"format": format_text, "version": version})
+            self.invalidate(FORMATS_COLLECTION)
+            return True, "Format updated successfully"
+        except TemplateError as e:
+            return False, f"Invalid format: {e}"
+        except Exception as e:
+            logging.error(f"Error setting format: {e}")
+            return False, f"Error: {e}"
+
+    @cached_read(FORMATS_COLLECTION, fallback=DEFAULT_FORMAT)
+    def get_format(self):
+        """Get the current format"""
+        format_doc = self._get_document("formats", "current_format")
+        if format_doc:
+            return format_doc["format"]
+        return DEFAULT_FORMAT
+
+    @cached_read(FORMATS_COLLECTION, fallback=(DEFAULT_FORMAT, 0))
+    def get_format_with_version(self):
+        """Get the current format and its version, which changes on every set_format"""
+        format_doc = self._get_document("formats", "current_format")
+        if format_doc:
+            return format_doc["format"], format_doc.get("version", 0)
+        return DEFAULT_FORMAT, 0
+
+    def set_start_message(self, message):
+        """Set the start message"""
+        try:
+            with self._transaction() as conn:
+                self._set_fields(conn, "settings", "start_message", {"message": message})
+            self.invalidate(SETTINGS_COLLECTION)
+            return True, "Start message updated successfully"
+        except Exception as e:
+            logging.error(f"Error setting start message: {e}")
+            return False, f"Error: {e}"
+
+    @cached_read(SETTINGS_COLLECTION, fallback=DEFAULT_START_MESSAGE)
+    def get_start_message(self):
+        """Get the start message"""
+        setting_doc = self._get_document("settings", "start_message")
+        if setting_doc:
+            return setting_doc["message"]
+        return DEFAULT_START_MESSAGE
+
+    def toggle_auto_forward(self):
+        """Toggle auto forward setting; returns (success, message, new status)"""
+        try:
+            enabled = self._toggle_setting("auto_forward", True)["enabled"]
+            return True, f"Auto forward {'enabled' if enabled else 'disabled'}", enabled
+        except Exception as e:
+            logging.error(f"Error toggling auto forward: {e}")
+            return False, f"Error: {e}", None
+
+    @cached_read(SETTINGS_COLLECTION, fallback=True)
+    def get_auto_forward_status(self):
+        """Get auto forward status"""
+        setting_doc = self._get_document("settings", "auto_forward")
+        if setting_doc:
+            return setting_doc.get("enabled", True)
+        return True  # Default enabled
+
+    def set_schedule_timer(self, hours, minutes):
+        """Set schedule timer"""
+        try:
+            with self._transaction() as conn:
+                self._set_fields(conn, "settings", "schedule_timer", {"hours": hours, "minutes": minutes, "enabled": True})
+            self.invalidate(SETTINGS_COLLECTION)
+            return True, f"Schedule timer set for {hours:02d}:{minutes:02d}"
+        except Exception as e:
+            logging.error(f"Error setting schedule timer: {e}")
+            return False, f"Error: {e}"
+
+    @cached_read(SETTINGS_COLLECTION, fallback={"hours": 0, "minutes": 0, "enabled": False})
+    def get_schedule_timer(self):
+        """Get schedule timer settings"""
+        setting_doc = self._get_document("settings", "schedule_timer")
+        if setting_doc:
+            return {
+                "hours": setting_doc.get("hours", 0),
+                "minutes": setting_doc.get("minutes", 0),
+                "enabled": setting_doc.get("enabled", False)
+            }
+        return {"hours": 0, "minutes": 0, "enabled": False}
+
+    def toggle_schedule_timer(self):
+        """Toggle schedule timer enabled/disabled; returns (success, message, stored timer)"""
+        try:
+            setting_doc = self._toggle_setting("schedule_timer", False)
+            timer = {"hours": setting_doc.get("hours", 0), "minutes": setting_doc.get("minutes", 0), "enabled": setting_doc["enabled"]}
+            return True, f"Schedule timer {'enabled' if timer['enabled'] else 'disabled'}", timer
+        except Exception as e:
+            logging.error(f"Error toggling schedule timer: {e}")
+            return False, f"Error: {e}", None
+
+    @cached_read(MEDIA_CACHE_COLLECTION, fallback=None)
+    def get_file_id(self, url, bot_id):
+        """Get the Telegram file_id previously returned for a media URL"""
+        rows = self._query("SELECT file_id FROM media_cache WHERE url = ? AND bot_id = ?", (url, bot_id))
+        return rows[0]["file_id"] if rows else None
+
+    def set_file_id(self, url, bot_id, file_id):
+        """Remember the Telegram file_id for a media URL (file_ids are only valid for the bot that got them)"""
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO media_cache (url, bot_id, file_id) VALUES (?, ?, ?)",
+                    (url, bot_id, file_id)
+                )
+            self.invalidate(MEDIA_CACHE_COLLECTION)
+            return True, "File id cached"
+        except Exception as e:
+            logging.error(f"Error caching file id: {e}")
+            return False, f"Error: {e}"
+
+    def forget_file_id(self, url, bot_id):
+        """Drop a cached file_id that Telegram no longer accepts"""
+        try:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM media_cache WHERE url = ? AND bot_id = ?", (url, bot_id))
+            self.invalidate(MEDIA_CACHE_COLLECTION)
+            return True, "File id removed"
+        except Exception as e:
+            logging.error(f"Error removing cached file id: {e}")
+            return False, f"Error: {e}"
+
+    def create_broadcast_job(self, payload, channels, reply_chat_id, source_message_id=None, posted_at=None):
+        """Record a post to deliver to `channels`; returns the job id or None"""
+        try:
+            deliveries = [{"channel_id": channel_id, "status": "pending", "attempts": 0} for channel_id in channels]
+            with self._transaction() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO broadcast_jobs (status, created_at, reply_chat_id, source_message_id, posted_at, payload, deliveries) "
+                    "VALUES ('pending', ?, ?, ?, ?, ?, ?)",
+                    (_now(), reply_chat_id, source_message_id, posted_at.isoformat() if posted_at else None,
+                     json.dumps(payload), json.dumps(deliveries))
+                )
+            return str(cursor.lastrowid)
+        except Exception as e:
+            logging.error(f"Error creating broadcast job: {e}")
+            return None
+
+    def get_unfinished_jobs(self):
+        """Get broadcast jobs that still have work to do, oldest first"""
+        try:
+            rows = self._query("SELECT * FROM broadcast_jobs WHERE status != 'done' ORDER BY created_at, id")
+            return [
+                {
+                    "_id": str(row["id"]),
+                    "status": row["status"],
+                    "created_at": datetime.datetime.fromisoformat(row["created_at"]),
+                    "reply_chat_id": row["reply_chat_id"],
+                    "source_message_id": row["source_message_id"],
+                    "posted_at": datetime.datetime.fromisoformat(row["posted_at"]) if row["posted_at"] else None,
+                    "payload": json.loads(row["payload"]),
+                    "deliveries": json.loads(row["deliveries"])
+                }
+                for row in rows
+            ]
+        except Exception as e:
+            logging.error(f"Error getting unfinished broadcast jobs: {e}")
+            return []
+
+    def update_delivery(self, job_id, index, **fields):
+        """Update the delivery state of one channel in a broadcast job"""
+        return self.update_deliveries(job_id, {index: fields})
+
+    def update_deliveries(self, job_id, updates):
+        """Update several deliveries of a broadcast job in one write; `updates` maps index -> fields"""
+        try:
+            paths = []
+            params = []
+            for index, fields in updates.items():
+                for key, value in fields.items():
+                    paths.append("?, json(?)")
+                    params.extend([f"$[{int(index)}].{key}", json.dumps(value)])
+            if not paths:
+                return True, "Deliveries updated"
+            with self._transaction() as conn:
+                # Large jobs are written in several json_set calls, all in this transaction
+                for start in range(0, len(paths), JSON_SET_MAX_PATHS):
+                    chunk = paths[start:start + JSON_SET_MAX_PATHS]
+                    conn.execute(
+                        f"UPDATE broadcast_jobs SET deliveries = json_set(deliveries, {', '.join(chunk)}) WHERE id = ?",
+                        params[2 * start:2 * (start + len(chunk))] + [int(job_id)]
+                    )
+            return True, "Deliveries updated"
+        except Exception as e:
+            logging.error(f"Error updating deliveries: {e}")
+            return False, f"Error: {e}"
+
+    def finish_broadcast_job(self, job_id):
+        """Mark a broadcast job as fully processed"""
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "UPDATE broadcast_jobs SET status = 'done', finished_at = ? WHERE id = ?",
+                    (_now(), int(job_id))
+                )
+            return True, "Broadcast job finished"
+        except Exception as e:
+            logging.error(f"Error finishing broadcast job: {e}")
+            return False, f"Error: {e}"
+
+    def recover_broadcast_jobs(self):
+        """After a restart, flag deliveries that were in flight when the process died.
+
+        We can't tell whether Telegram accepted those sends, so they are marked
+        "unknown" and reported instead of being posted a second time.
+        """
+        try:
+            recovered = 0
+            with self._transaction() as conn:
+                rows = conn.execute("SELECT id, deliveries FROM broadcast_jobs WHERE status != 'done'").fetchall()
+                for row in rows:
+                    deliveries = json.loads(row["deliveries"])
+                    if not any(d["status"] == "sending" for d in deliveries):
+                        continue
+                    for delivery in deliveries:
+                        if delivery["status"] == "sending":
+                            delivery["status"] = "unknown"
+                    conn.execute("UPDATE broadcast_jobs SET deliveries = ? WHERE id = ?", (json.dumps(deliveries), row["id"]))
+                    recovered += 1
+            return True, f"Recovered {recovered} interrupted job(s)"
+        except Exception as e:
+            logging.error(f"Error recovering broadcast jobs: {e}")
+            return False, f"Error: {e}"
+
+class MemoryDatabase(SQLiteDatabase):
+    """In-memory SQLite backend for tests, benchmarks and throwaway runs; nothing survives a restart"""
+
+    backend = "memory"
+
+    def __init__(self):
+        super().__init__(":memory:")
+        # A :memory: database lives in its connection, so every thread shares one and takes turns
+        self._lock = threading.RLock()
+        self._shared = None
+
+    def _raw_connection(self):
+        if self._shared is None:
+            self._shared = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+            self._shared.row_factory = sqlite3.Row
+        return self._shared
@@ -0,0 +1,156 @@
+import html
+import re
+
+# Values handle_message extracts from a post; a template may use any of them
+TEMPLATE_FIELDS = ("title", "price", "link", "description")
+
+# Shown by /format as a preview of a new template
+SAMPLE_VALUES = {
+    "title": "Sample Movie (2024)",
+    "price": "Free",
+    "link": "https://example.com/sample",
+    "description": "A short description of the post.",
+}
+
+# Lowercase letters to their small-capital forms, the lettering used across the bot's posts
+SMALL_CAPS_TABLE = str.maketrans(
+    "abcdefghijklmnopqrstuvwxyz",
+    "ᴀʙᴄᴅᴇꜰɢʜɪᴊᴋʟᴍɴᴏᴘǫʀꜱᴛᴜᴠᴡxʏᴢ"
+)
+
+# {{ and }} are literal braces, {...} is a placeholder, and a lone brace is an error
+TOKEN_RE = re.compile(r'\{\{|\}\}|\{([^{}]*)\}|[{}]')
+
+class TemplateError(ValueError):
+    """Raised when a post template can't be compiled"""
+
+def _truncate(arg):
+    try:
+        limit = int(arg)
+    except (TypeError, ValueError):
+        raise TemplateError(f"truncate needs a length, e.g. truncate:100 (got '{arg}')")
+    if limit < 1:
+        raise TemplateError("truncate length must be at least 1")
+
+    def truncate(value):
+        if len(value) <= limit:
+            return value
+        return value[:limit - 1].rstrip() + "…"
+    return truncate
+
+def _default(arg):
+    if arg is None:
+        raise TemplateError("default needs a value, e.g. default:N/A")
+    return lambda value: value or arg
+
+def _no_arg(name, func):
+    def build(arg):
+        if arg is not None:
+            raise TemplateError(f"{name} doesn't take an argument")
+        return func
+    return build
+
+def _escape(value):
+    return html.escape(value, quote=False)
+
+# filter name -> builder(arg) returning the function applied to the value
+FILTERS = {
+    "default": _default,
+    "truncate": _truncate,
+    "escape": _no_arg("escape", _escape),
+    "smallcaps": _no_arg("smallcaps", lambda value: value.translate(SMALL_CAPS_TABLE)),
+    "upper": _no_arg("upper", str.upper),
+    "lower": _no_arg("lower", str.lower),
+}
+
+def _compile_placeholder(expression):
+    name, *filter_specs = [part.strip() for part in expression.split("|")]
+    if not name:
+        raise TemplateError("Empty placeholder {}")
+    if name not in TEMPLATE_FIELDS:
+        raise TemplateError(f"Unknown variable {{{name}}}, use one of: {', '.join(TEMPLATE_FIELDS)}")
+
+    filters = []
+    escape = False
+    for spec in filter_specs:
+        filter_name, separator, arg = spec.partition(":")
+        builder = FILTERS.get(filter_name.strip())
+        if builder is None:
+            raise TemplateError(f"Unknown filter '{filter_name}' in {{{expression}}}, use one of: {', '.join(FILTERS)}")
+        apply = builder(arg if separator else None)
+        if apply is _escape:
+            escape = True
+        else:
+            filters.append(apply)
+    # Escaping always runs last, wherever it is written: truncating or changing the case of
+    # an escaped value would cut or corrupt its entities ("&amp…", "&AMP;")
+    if escape:
+        filters.append(_escape)
+
+    if not filters:
+        return lambda values: str(values.get(name, ""))
+
+    def render(values):
+        value = str(values.get(name, ""))
+        for apply in filters:
+            value = apply(value)
+        return value
+    return render
+
+class Template:
+    """A post template compiled into literal strings and placeholder functions"""
+
+    __slots__ = ("source", "pieces")
+
+    def __init__(self, source, pieces):
+        self.source = source
+        self.pieces = pieces
+
+    def render(self, values):
+        """Fill the template from `values`; missing variables render as empty strings"""
+        return "".join([piece if piece.__class__ is str else piece(values) for piece in self.pieces])
+
+def compile_template(source):
+    """Parse and validate a template like '{title|truncate:80|escape}'; raises TemplateError"""
+    pieces = []
+    literal = []
+    position = 0
+    for match in TOKEN_RE.finditer(source):
+        literal.append(source[position:match.start()])
+        position = match.end()
+        token = match.group()
+        if token == "{{":
+            literal.append("{")
+        elif token == "}}":
+            literal.append("}")
+        elif match.group(1) is not None:
+            text = "".join(literal)
+            if text:
+                pieces.append(text)
+            literal = []
+            pieces.append(_compile_placeholder(match.group(1)))
+        else:
+            raise TemplateError(f"Unmatched '{token}' at position {match.start()}, write {token}{token} for a literal brace")
+    literal.append(source[position:])
+    text = "".join(literal)
+    if text:
+        pieces.append(text)
+    return Template(source, tuple(pieces))
+
+class TemplateCache:
+    """Keeps the compiled form of the current template; it is only recompiled when the version changes"""
+
+    def __init__(self):
+        self._version = None
+        self._template = None
+
+    def get(self, source, version):
+        """Compiled template for `source` stored as `version`; raises TemplateError if it doesn't compile"""
+        template = self._template
+        if template is None or version != self._version or source != template.source:
+            template = compile_template(source)
+            self._template, self._version = template, version
+        return template
+
+# Shared by all handlers
+template_cache = TemplateCache()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Must be set before the bot's modules read their configuration
+os.environ.setdefault("STORAGE_BACKEND", "memory")
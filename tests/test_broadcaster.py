@@ -0,0 +1,14 @@
+import asyncio
+from broadcaster import ChannelDispatcher
+
+def test_throttled_channel_does_not_hold_a_send_slot():
+    # One send slot; channel "a" must wait about a second for its second token
+    dispatcher = ChannelDispatcher(per_chat_rate=60, per_chat_burst=1, max_concurrency=1)
+    sent = []
+
+    async def send(channel_id, item):
+        sent.append((channel_id, item))
+
+    results = asyncio.run(dispatcher.stream({"a": [1, 2], "b": [1]}, send))
+    assert all(result.success for _, result in results)
+    assert sent.index(("b", 1)) < sent.index(("a", 2))
@@ -0,0 +1,22 @@
+import pytest
+from extractor import extract_fields
+
+@pytest.mark.parametrize("text", [
+    "Price-drop alert! Boat earbuds now cheaper\nGrab fast",
+    "Name-brand sneakers at half price",
+    "Cost-effective earbuds for everyone\nLimited stock",
+    "Title-less deal on boAt earbuds",
+])
+def test_hyphenated_label_words_are_not_fields(text):
+    fields = extract_fields(text)
+    assert fields["title"] == text
+    assert fields["price"] == ""
+
+@pytest.mark.parametrize("text, title, price", [
+    ("Title: Boat earbuds\nPrice: Rs. 499", "Boat earbuds", "₹499"),
+    ("Title - Boat earbuds\nPrice – Rs. 499", "Boat earbuds", "₹499"),
+    ("• Name = Boat earbuds\nMRP: 999", "Boat earbuds", "999"),
+])
+def test_separators(text, title, price):
+    fields = extract_fields(text)
+    assert (fields["title"], fields["price"]) == (title, price)
@@ -0,0 +1,9 @@
+from flood_control import FloodCoordinator
+
+def test_global_burst_stays_small_when_rate_changes():
+    coordinator = FloodCoordinator(max_rate=30, burst=1)
+    assert coordinator.bucket.capacity == 1
+    coordinator.record_flood(0)
+    coordinator._set_rate(coordinator.max_rate)
+    assert coordinator.bucket.capacity == 1
+    assert coordinator.bucket.fill_rate == 30
@@ -0,0 +1,19 @@
+import asyncio
+import builtins
+import dis
+import main
+
+async def sample_handler(update, context):
+    return "handled"
+
+def test_instrument_wraps_handler():
+    handler = main.instrument(sample_handler)
+    assert asyncio.run(handler(None, None)) == "handled"
+
+def test_entry_point_globals_resolve():
+    # on_startup and on_stop only run once the bot is connected, so check the names they use here
+    for function in (main.instrument, main.on_startup, main.on_stop, main.main):
+        for instruction in dis.get_instructions(function):
+            if instruction.opname == "LOAD_GLOBAL":
+                name = instruction.argval
+                assert hasattr(main, name) or hasattr(builtins, name), f"{function.__name__}: {name}"
@@ -0,0 +1,53 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+from database import async_db
+from post_queue import PostQueue, post_order
+
+class FakeBot:
+    """Records what each chat receives"""
+
+    id = 42
+
+    def __init__(self):
+        self.sent = []
+        self._message_id = 0
+
+    def _message(self):
+        self._message_id += 1
+        return SimpleNamespace(message_id=self._message_id, photo=None)
+
+    async def send_photo(self, chat_id, photo, caption=None, parse_mode=None):
+        self.sent.append((chat_id, caption))
+        return self._message()
+
+    async def send_media_group(self, chat_id, media):
+        self.sent.append((chat_id, media[0].caption))
+        return [self._message() for _ in media]
+
+    async def send_message(self, chat_id, text):
+        return self._message()
+
+def test_posts_reach_channels_in_the_order_they_were_sent():
+    sent_at = datetime.datetime(2026, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+    channels = ["-100501", "-100502"]
+
+    async def run():
+        queue = PostQueue()
+        queue.bot = FakeBot()
+        # The album was sent first but is queued last, after its photos were collected
+        await queue.enqueue({"type": "photo", "photo": "text-post", "caption": "second"}, channels, None, 11, sent_at)
+        await queue.enqueue({"type": "album", "media": ["a", "b"], "caption": "first"}, channels, None, 9, sent_at)
+        jobs = sorted(await async_db.get_unfinished_jobs(), key=post_order)
+        await queue._process_batch(jobs)
+        return queue.bot.sent
+
+    sent = asyncio.run(run())
+    for channel_id in channels:
+        assert [caption for chat_id, caption in sent if chat_id == channel_id] == ["first", "second"]
+
+def test_jobs_without_a_source_message_sort_by_creation_time():
+    created = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    old = {"created_at": created}
+    new = {"created_at": created + datetime.timedelta(seconds=1), "source_message_id": 5, "posted_at": None}
+    assert sorted([new, old], key=post_order) == [old, new]
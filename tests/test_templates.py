@@ -0,0 +1,35 @@
+import pytest
+from templates import TemplateError, compile_template
+
+def render(source, **values):
+    return compile_template(source).render(values)
+
+@pytest.mark.parametrize("source, expected", [
+    ("{title|truncate:7|escape}", "A &amp; B…"),
+    ("{title|escape|truncate:7}", "A &amp; B…"),
+    ("{title|escape|upper}", "A &amp; B &amp; C"),
+    ("{title|upper|escape}", "A &amp; B &amp; C"),
+])
+def test_escape_runs_after_other_filters(source, expected):
+    assert render(source, title="A & B & C") == expected
+
+def test_escaped_smallcaps_keeps_entities():
+    assert render("{title|escape|smallcaps}", title="tom & jerry") == "ᴛᴏᴍ &amp; ᴊᴇʀʀʏ"
+
+def test_filters_run_in_order():
+    assert render("{title|truncate:5|upper}", title="abcdefgh") == "ABCD…"
+    assert render("{price|default:Free|lower}", price="") == "free"
+    assert render("{price|default:Free}", price="₹499") == "₹499"
+
+def test_escape_covers_default_value():
+    assert render("{price|escape|default:<none>}", price="") == "&lt;none&gt;"
+
+def test_literal_braces_and_missing_values():
+    assert render("{{{title}}} {link}", title="x") == "{x} "
+
+@pytest.mark.parametrize("source", [
+    "{title|truncate}", "{title|truncate:0}", "{title|nope}", "{name}", "{title|escape:1}", "{title", "{}",
+])
+def test_invalid_templates(source):
+    with pytest.raises(TemplateError):
+        compile_template(source)
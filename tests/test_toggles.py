@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+from bot_handlers import toggle_auto_forward_callback, toggle_channel_callback, toggle_schedule_callback
+from database import async_db, db
+
+class FakeQuery:
+    """Callback query stand-in that records menu edits"""
+
+    def __init__(self, message_id):
+        self.from_user = SimpleNamespace(id=1, first_name="Admin")
+        self.message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=message_id, photo=None)
+        self.edits = []
+
+    async def edit_message_text(self, text, parse_mode=None, reply_markup=None):
+        self.edits.append((text, reply_markup))
+
+def button_texts(markup):
+    return [button.text for row in markup.inline_keyboard for button in row]
+
+def test_toggles_return_the_stored_value():
+    async def run():
+        await async_db.add_channel("-100777")
+        first = await async_db.toggle_channel("-100777")
+        second = await async_db.toggle_channel("-100777")
+        return first, second, await async_db.toggle_channel("-100404")
+    first, second, missing = asyncio.run(run())
+    assert (first[0], first[2]) == (True, False)
+    assert (second[0], second[2]) == (True, True)
+    assert missing[0] is False and missing[2] is None
+
+def test_channel_screen_uses_stored_value_with_stale_cache():
+    async def run():
+        await async_db.add_channel("-100888")
+        await async_db.get_all_channels_with_status()
+        # Another replica deactivates the channel; this process's cache still says active
+        with db._transaction() as conn:
+            conn.execute("UPDATE channels SET active = 0 WHERE channel_id = '-100888'")
+        query = FakeQuery(10)
+        await toggle_channel_callback(query, None, "-100888")
+        return query
+    query = asyncio.run(run())
+    text, markup = query.edits[-1]
+    assert "✅ -100888" in button_texts(markup)
+
+def test_settings_screens_use_stored_values():
+    async def run():
+        expected_forward = not await async_db.get_auto_forward_status()
+        expected_timer = not (await async_db.get_schedule_timer())["enabled"]
+        forward_query, timer_query = FakeQuery(20), FakeQuery(21)
+        await toggle_auto_forward_callback(forward_query, None, "")
+        await toggle_schedule_callback(timer_query, None, "")
+        return expected_forward, expected_timer, forward_query, timer_query
+    expected_forward, expected_timer, forward_query, timer_query = asyncio.run(run())
+    assert any(("🟢 ON" if expected_forward else "🔴 OFF") in t and "Auto Forward" in t
+               for t in button_texts(forward_query.edits[-1][1]))
+    assert ("🟢 ON" if expected_timer else "🔴 OFF") in timer_query.edits[-1][0]
@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+from starlette.testclient import TestClient
+from webhook_server import SECRET_HEADER, create_app
+
+SECRET = "test-secret"
+PATH = "/telegram"
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": 1, "type": "private"},
+        "text": "hello",
+    },
+}
+
+def make_client():
+    # create_app only uses the bot and the update queue of the application
+    application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+    return application, TestClient(create_app(application, secret_token=SECRET, path=PATH))
+
+def test_wrong_secret_is_rejected():
+    application, client = make_client()
+    response = client.post(PATH, json=UPDATE, headers={SECRET_HEADER: "wrong"})
+    assert response.status_code == 403
+    assert application.update_queue.empty()
+
+def test_valid_update_is_queued():
+    application, client = make_client()
+    response = client.post(PATH, json=UPDATE, headers={SECRET_HEADER: SECRET})
+    assert response.status_code == 200
+    assert application.update_queue.get_nowait().update_id == 1
+
+def test_malformed_body_is_rejected():
+    application, client = make_client()
+    for body in (b"{not json", b"[]", b"42", b'{"foo": 1}', b'{"update_id": 2, "message": {"foo": 1}}'):
+        response = client.post(PATH, content=body, headers={SECRET_HEADER: SECRET})
+        assert response.status_code == 400, body
+    assert application.update_queue.empty()
@@ -0,0 +1,88 @@
+import hmac
+import logging
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from config import WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, PORT
+from health import health_status
+from metrics import CONTENT_TYPE, registry
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def create_app(application, secret_token=WEBHOOK_SECRET, path=WEBHOOK_PATH):
+    """Build the ASGI app that feeds webhook updates into `application`.
+
+    Only `application.bot` and `application.update_queue` are used, so tests can
+    pass a stand-in object and POST updates to it.
+    """
+    async def telegram_webhook(request):
+        # Reject anything that doesn't carry the secret we registered with Telegram
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+            return Response(status_code=403)
+        try:
+            payload = await request.json()
+        except ValueError:
+            return Response(status_code=400)
+        # Valid JSON that isn't an update object is as malformed as invalid JSON; answer 400
+        # so Telegram doesn't keep retrying it as it would after a 500
+        if not isinstance(payload, dict):
+            return Response(status_code=400)
+        try:
+            update = Update.de_json(payload, application.bot)
+        except Exception as e:
+            # de_json raises TypeError, KeyError, AttributeError... depending on what is missing
+            logging.warning(f"Rejected malformed webhook update: {type(e).__name__}: {e}")
+            return Response(status_code=400)
+
+        await application.update_queue.put(update)
+        return Response()
+
+    async def home(request):
+        return PlainTextResponse("Telegram Bot is running!")
+
+    async def health(request):
+        return JSONResponse(health_status())
+
+    async def metrics(request):
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
+    return Starlette(routes=[
+        Route(path, telegram_webhook, methods=["POST"]),
+        Route("/", home),
+        Route("/health", health),
+        Route("/metrics", metrics),
+    ])
+
+async def run_webhook(application, allowed_updates):
+    """Run the bot in webhook mode, serving updates and health checks on one event loop"""
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(application),
+        host="0.0.0.0",
+        port=PORT,
+        log_level="warning",
+    ))
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+
+        await application.bot.set_webhook(
+            url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=True
+        )
+        await application.start()
+        logging.info(f"Webhook server listening on port {PORT}")
+        try:
+            # Returns once uvicorn receives SIGINT/SIGTERM
+            await server.serve()
+        finally:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+
+    if application.post_shutdown:
+        await application.post_shutdown(application)